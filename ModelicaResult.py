@@ -5,7 +5,17 @@
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import os
-import DyMat
+import bisect
+import json
+import shutil
+import tempfile
+import zlib
+import fnmatch
+from multiprocessing.pool import Pool, ThreadPool
+try:
+    import DyMat
+except ImportError: #only needed for results MatResultFile does not read
+    DyMat = None
 import numpy as np
 import re
 # from mpl_toolkits import mplot3d
@@ -14,26 +24,436 @@ import matplotlib.cm as cmap
 import pprint
 pp = pprint.PrettyPrinter(indent=2)
 
+class MatResultFile: #reads Dymola/OpenModelica MAT v4 results, memory-mapping data_1/data_2 so only the requested variables are read into memory
+    """DyMat.DyMatFile-compatible reader for trajectory results (Aclass version 1.1, binTrans or binNormal).
+    The matrix headers, name and dataInfo are parsed on open; data() copies a single variable out of the mapped file.
+    """
+    _dtypes = {0:'f8', 1:'f4', 2:'i4', 3:'i2', 4:'u2', 5:'u1'} #MAT v4 precision digit P of MOPT
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self._mm = np.memmap(fileName, dtype=np.uint8, mode='r')
+        self._matrices = {} # name : (dtype, mrows, ncols, offset)
+        self._blocks = {} # block number : 2D view of (variables, time)
+        self._vars = {} # name : (index, block, column, sign)
+        self._readHeaders()
+
+        fileInfo = self._strings(self._matrix('Aclass'))
+        if len(fileInfo) < 4 or fileInfo[1] != '1.1' or fileInfo[3] not in ('binTrans', 'binNormal'):
+            raise ValueError(f'{fileName}: MatResultFile only reads Aclass 1.1 binTrans/binNormal results, found {fileInfo}')
+        self._trans = fileInfo[3] == 'binTrans'
+
+        names = self._strings(self._matrix('name'), self._trans)
+        dataInfo = np.asarray(self._matrix('dataInfo'), dtype=np.int64)
+        if not self._trans:
+            dataInfo = dataInfo.T
+        for i,n in enumerate(names):
+            d = int(dataInfo[0][i]) # data block
+            x = int(dataInfo[1][i])
+            c = abs(x)-1  # column
+            s = 1 if 0 <= x else -1   # sign, negative for aliases like a = -b
+            if c:
+                self._vars[n] = (i, d, c, s)
+            else:
+                self._absc = n
+                self._abscIndex = i
+        self._descriptions = None
+
+    def _readHeaders(self): #walk the file, recording where each matrix's data starts
+        pos = 0
+        size = len(self._mm)
+        while pos + 20 <= size:
+            header = self._mm[pos:pos+20].view('<i4')
+            if not (0 <= header[0] < 5000): #M digit of MOPT: 0 little endian, 1 big endian
+                header = self._mm[pos:pos+20].view('>i4')
+            mopt, mrows, ncols, imagf, namlen = (int(h) for h in header)
+            if (mopt // 10) % 10 not in self._dtypes:
+                raise ValueError(f'{self.fileName}: unknown MAT v4 matrix type {mopt} at byte {pos}')
+            order = '<' if mopt // 1000 == 0 else '>'
+            dtype = np.dtype(order + self._dtypes[(mopt // 10) % 10])
+            name = bytes(self._mm[pos+20:pos+20+namlen]).rstrip(b'\x00').decode()
+            offset = pos + 20 + namlen
+            if mrows and offset + mrows*ncols*dtype.itemsize > size: #a result still being written, or cut short: keep the complete columns
+                ncols = (size - offset) // (mrows*dtype.itemsize)
+                self._matrices[name] = (dtype, mrows, ncols, offset)
+                break
+            self._matrices[name] = (dtype, mrows, ncols, offset)
+            pos = offset + mrows*ncols*dtype.itemsize*(2 if imagf else 1)
+
+    def _matrix(self, name): #zero-copy view of a stored matrix, shape (mrows, ncols)
+        dtype, mrows, ncols, offset = self._matrices[name]
+        return np.ndarray((mrows, ncols), dtype=dtype, buffer=self._mm, offset=offset, order='F')
+
+    def _strings(self, mat, columns=False): #decode a char matrix into strings, one per row or per column
+        if columns:
+            mat = mat.T
+        return [bytes(np.asarray(row, dtype=np.uint8)).decode('latin-1').rstrip(' \x00') for row in mat]
+
+    def _block(self, b): #(variables, time) view of data_b
+        if b not in self._blocks:
+            mat = self._matrix('data_%d' % (b))
+            self._blocks[b] = mat if self._trans else mat.T
+        return self._blocks[b]
+
+    def names(self, block=None):
+        if block is None:
+            return self._vars.keys()
+        else:
+            return [k for (k,v) in self._vars.items() if v[1] == block]
+
+    def data(self, varName): #copy one variable out of the mapped file
+        tmp, d, c, s = self._vars[varName]
+        dd = np.array(self._block(d)[c], dtype=float)
+        if s < 0:
+            dd *= -1
+        return dd
+
+    __getitem__ = data
+
+    def block(self, varName):
+        return self._vars[varName][1]
+
+    def description(self, varName):
+        return self._description(self._vars[varName][0])
+
+    def _description(self, index): #description of the index'th name, the abscissa included
+        if self._descriptions is None:
+            self._descriptions = self._strings(self._matrix('description'), self._trans)
+        return self._descriptions[index]
+
+    def sharedData(self, varName): #variables which share data with this variable, possibly with a different sign
+        tmp, d, c, s = self._vars[varName]
+        return [(n,v[3]*s) for (n,v) in self._vars.items() if n!=varName and v[1]==d and v[2]==c]
+
+    def size(self, blockOrName):
+        try:
+            b = int(blockOrName)
+        except ValueError:
+            b = self._vars[blockOrName][1]
+        return self._block(b).shape[1]
+
+    def abscissa(self, blockOrName, valuesOnly=False):
+        try:
+            b = int(blockOrName)
+        except ValueError:
+            b = self._vars[blockOrName][1]
+        values = np.array(self._block(b)[0], dtype=float)
+        if valuesOnly:
+            return values
+        return values, self._absc, self._description(self._abscIndex)
+
+class SidecarResultFile: #reads the columnar sidecar written by writeSidecar(), memory-mapping its per-variable rows
+    """DyMat.DyMatFile-compatible reader for a <result>.mat.cols sidecar directory.
+    Every distinct data column of the result is stored as one contiguous row, so opening is a few small reads and data() touches only its own row.
+    """
+    def __init__(self, sidecarPath):
+        self.fileName = sidecarPath
+        with open(os.path.join(sidecarPath, 'index.json'), 'r') as f:
+            self.info = json.load(f)
+        with open(os.path.join(sidecarPath, 'names.txt'), 'r', encoding='utf-8') as f:
+            names = f.read().split('\n')
+        rows = np.load(os.path.join(sidecarPath, 'vars.npy')) # block, row, sign of each name
+        self._vars = dict(zip(names, rows.tolist()))
+        self._absc = self.info['abscissa']
+        self._compressed = self.info['compressed']
+        self._data = {1:np.load(os.path.join(sidecarPath, 'data_1.npy'), mmap_mode='r')}
+        if self._compressed:
+            self._data[2] = np.memmap(os.path.join(sidecarPath, 'data_2.zlib'), dtype=np.uint8, mode='r')
+            self._offsets = np.load(os.path.join(sidecarPath, 'offsets_2.npy'))
+        else:
+            self._data[2] = np.load(os.path.join(sidecarPath, 'data_2.npy'), mmap_mode='r')
+        self._names = names
+        self._descriptions = None
+
+    def _row(self, block, row):
+        if block == 2 and self._compressed:
+            raw = zlib.decompress(self._data[2][self._offsets[row]:self._offsets[row+1]])
+            return np.frombuffer(raw, dtype=float).copy()
+        return np.array(self._data[block][row], dtype=float)
+
+    def names(self, block=None):
+        if block is None:
+            return self._vars.keys()
+        else:
+            return [k for (k,v) in self._vars.items() if v[0] == block]
+
+    def data(self, varName):
+        d, r, s = self._vars[varName]
+        dd = self._row(d, r)
+        if s < 0:
+            dd *= -1
+        return dd
+
+    __getitem__ = data
+
+    def block(self, varName):
+        return self._vars[varName][0]
+
+    def description(self, varName):
+        if self._descriptions is None:
+            with open(os.path.join(self.fileName, 'descriptions.txt'), 'r', encoding='utf-8') as f:
+                self._descriptions = dict(zip(self._names, f.read().split('\n')))
+        return self._descriptions[varName]
+
+    def sharedData(self, varName):
+        d, r, s = self._vars[varName]
+        return [(n,v[2]*s) for (n,v) in self._vars.items() if n!=varName and v[0]==d and v[1]==r]
+
+    def size(self, blockOrName):
+        try:
+            b = int(blockOrName)
+        except ValueError:
+            b = self._vars[blockOrName][0]
+        return self.info['ntime'] if b == 2 else self._data[1].shape[1]
+
+    def abscissa(self, blockOrName, valuesOnly=False):
+        try:
+            b = int(blockOrName)
+        except ValueError:
+            b = self._vars[blockOrName][0]
+        values = self._row(b, 0)
+        if valuesOnly:
+            return values
+        return values, self._absc, self.info.get('abscissaDescription', '') #absent from older sidecars
+
+def getSidecarPath(resultPath): #where writeSidecar() puts the sidecar of resultPath
+    return os.path.expanduser(resultPath) + '.cols'
+
+def isSidecarFresh(resultPath): #True if resultPath has a sidecar written from its current contents
+    sidecarPath = getSidecarPath(resultPath)
+    try:
+        with open(os.path.join(sidecarPath, 'index.json'), 'r') as f:
+            info = json.load(f)
+        st = os.stat(os.path.expanduser(resultPath))
+    except (OSError, ValueError):
+        return False
+    return info.get('version') == 1 and info.get('sourceSize') == st.st_size and info.get('sourceMtime') == st.st_mtime_ns
+
+def writeSidecar(resultPath, compress=False, chunk=4096): #write the columnar sidecar of a MAT v4 result, returning its path
+    """Writes <resultPath>.cols/ holding each distinct data column of resultPath as a contiguous row:
+    data_2.npy (or zlib-compressed rows in data_2.zlib with compress=True), data_1.npy, and the sorted names with their block, row and sign.
+    The source size and mtime are recorded so isSidecarFresh() can detect a resimulated result.
+    """
+    resultPath = os.path.expanduser(resultPath)
+    src = MatResultFile(resultPath)
+    st = os.stat(resultPath)
+    sidecarPath = getSidecarPath(resultPath)
+    staging = tempfile.mkdtemp(prefix='.cols_', dir=os.path.dirname(os.path.abspath(resultPath)))
+    try:
+        _writeSidecarFiles(src, st, staging, compress, chunk)
+    except BaseException: #leave no half-written staging directory behind
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if os.path.exists(sidecarPath):
+        shutil.rmtree(sidecarPath)
+    os.replace(staging, sidecarPath)
+    return sidecarPath
+
+def _writeSidecarFiles(src, st, staging, compress, chunk): #the files of writeSidecar(), written into staging
+    names = sorted(src.names())
+    rows = {1:{0:0}, 2:{0:0}} # block : {source column : sidecar row}, row 0 is the abscissa
+    varRows = np.zeros((len(names), 3), dtype=np.int64)
+    for i,n in enumerate(names):
+        idx, d, c, sgn = src._vars[n]
+        r = rows[d].setdefault(c, len(rows[d]))
+        varRows[i] = (d, r, sgn)
+    np.save(os.path.join(staging, 'vars.npy'), varRows)
+    with open(os.path.join(staging, 'names.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(names))
+    with open(os.path.join(staging, 'descriptions.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(src.description(n).replace('\n', ' ') for n in names))
+
+    for d in (1, 2):
+        cols = np.array(sorted(rows[d], key=rows[d].get))
+        view = src._block(d)
+        ntime = view.shape[1]
+        if d == 2 and compress:
+            offsets = [0]
+            with open(os.path.join(staging, 'data_2.zlib'), 'wb') as f:
+                for c in cols:
+                    z = zlib.compress(np.ascontiguousarray(view[c], dtype=float).tobytes(), 1)
+                    f.write(z)
+                    offsets.append(offsets[-1] + len(z))
+            np.save(os.path.join(staging, 'offsets_2.npy'), np.array(offsets, dtype=np.int64))
+        else:
+            out = np.lib.format.open_memmap(os.path.join(staging, 'data_%d.npy' % (d)), mode='w+', dtype=float, shape=(len(cols), ntime))
+            for t in range(0, ntime, chunk): #bounded memory for large results
+                out[:, t:t+chunk] = view[cols, t:t+chunk]
+            out.flush()
+            del out
+
+    with open(os.path.join(staging, 'index.json'), 'w') as f:
+        json.dump({'version':1, 'sourceSize':st.st_size, 'sourceMtime':st.st_mtime_ns, 'abscissa':src._absc,
+                   'abscissaDescription':src._description(src._abscIndex).replace('\n', ' '),
+                   'ntime':src._block(2).shape[1], 'compressed':compress}, f)
+
+def _writeMatrixHeader(f, name, dtype, mrows, ncols, order='<'): #MAT v4 header for a matrix of dtype, or of text for dtype None, in the file's byte order '<' or '>'
+    if dtype is None:
+        mopt = 51
+    else:
+        mopt = 10*{v:k for k,v in MatResultFile._dtypes.items()}[dtype.str[1:]]
+    if order == '>':
+        mopt += 1000
+    f.write(np.array([mopt, mrows, ncols, 0, len(name)+1], dtype=order+'i4').tobytes())
+    f.write(name.encode() + b'\0')
+
+def _writeStrings(f, name, strings, trans, order='<'): #char matrix of strings, one per column for binTrans and per row for binNormal
+    width = max(1, max(len(s) for s in strings))
+    chars = np.frombuffer(''.join(s.ljust(width) for s in strings).encode('latin-1'), dtype=np.uint8).reshape(len(strings), width)
+    if trans:
+        _writeMatrixHeader(f, name, None, width, len(strings), order)
+        f.write(chars.tobytes())
+    else:
+        _writeMatrixHeader(f, name, None, len(strings), width, order)
+        f.write(chars.tobytes(order='F'))
+
+def removeParameters(resultPath, chunk=2**24): #rewrite a MAT v4 result without the parameters and constants of data_1, returning the number of variables removed
+    """Drops every variable stored in data_1, keeping the abscissa and the data_2 trajectories unchanged; the file is replaced only once it is complete.
+    This is how ModelicaSimulate's dropParameters is honoured, as OMC's variableFilter cannot exclude names. The rewritten file keeps the source's byte order.
+    """
+    resultPath = os.path.expanduser(resultPath)
+    src = MatResultFile(resultPath)
+    trans = src._trans
+    names = src._strings(src._matrix('name'), trans)
+    descriptions = src._strings(src._matrix('description'), trans)
+    dataInfo = np.array(src._matrix('dataInfo'), dtype=np.int32)
+    if not trans:
+        dataInfo = dataInfo.T # (4, names)
+    keep = dataInfo[0] != 1
+    if keep.all():
+        return 0
+    order = '>' if src._matrices['dataInfo'][0].str[0] == '>' else '<' #readers take the whole file's byte order from its first matrix
+
+    fd, staging = tempfile.mkstemp(prefix='.params_', dir=os.path.dirname(os.path.abspath(resultPath)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for name, (dtype, mrows, ncols, offset) in src._matrices.items():
+                if name == 'name':
+                    _writeStrings(f, name, [n for n,k in zip(names, keep) if k], trans, order)
+                elif name == 'description':
+                    _writeStrings(f, name, [n for n,k in zip(descriptions, keep) if k], trans, order)
+                elif name == 'dataInfo':
+                    kept = dataInfo[:, keep].astype(order+'i4')
+                    _writeMatrixHeader(f, name, kept.dtype, *(kept.shape if trans else kept.T.shape), order)
+                    f.write((kept if trans else kept.T).tobytes(order='F'))
+                elif name == 'data_1': #only the abscissa row remains
+                    first = np.ascontiguousarray(src._block(1)[:1], dtype=dtype.newbyteorder(order))
+                    _writeMatrixHeader(f, name, first.dtype, *(first.shape if trans else first.T.shape), order)
+                    f.write((first if trans else first.T).tobytes(order='F'))
+                else: #copied as stored, in chunks so large trajectories need little memory
+                    if dtype.str[0] not in ('|', order): #a matrix stored in the other byte order, rare enough to convert whole
+                        matrix = np.asarray(src._matrix(name), dtype=dtype.newbyteorder(order))
+                        _writeMatrixHeader(f, name, matrix.dtype, mrows, ncols, order)
+                        f.write(matrix.tobytes(order='F'))
+                        continue
+                    _writeMatrixHeader(f, name, dtype if name != 'Aclass' else None, mrows, ncols, order)
+                    end = offset + mrows*ncols*dtype.itemsize
+                    for pos in range(offset, end, chunk):
+                        f.write(bytes(src._mm[pos:min(pos+chunk, end)]))
+        del src #release the mapped file before replacing it
+        os.replace(staging, resultPath)
+    except BaseException:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+    return int((~keep).sum())
+
 class ModelicaResult:
     resultPath = ''
     dat = []
-
-    def loadResult(self, resultFilePath): #loads the given results for analysis
+    names = [] # sorted variable names
+    nameIndex = {} # name : position in names, for O(1) findName()
+    _joinedNames = '' # names joined by newlines, searched by findPartialName()
+    _nameStarts = [] # offset of each name in _joinedNames
+    _partialNames = {} # stub : findPartialName() result
+    _componentTree = None # component : {'children', 'leaves'}, see getComponentTree()
+    _partParents = None # name part : set of components having a child of that name
+    _time = None # the abscissa, see getTime()
+
+    def loadResult(self, resultFilePath, lazy=True, useSidecar=True, makeSidecar=False): #loads the given results for analysis; lazy=True memory-maps the file and reads variables on demand, False reads it all with DyMat
+        """useSidecar=True read from the columnar sidecar when it is fresh, see writeSidecar()
+        makeSidecar=False write the sidecar when it is missing or stale, so later loads are fast
+        """
         if os.path.exists( resultFilePath ):
             self.resultPath = os.path.expanduser(resultFilePath)
-            self.dat = DyMat.DyMatFile(self.resultPath)
+            self.dat = []
+            if lazy and (useSidecar or makeSidecar):
+                if makeSidecar and not isSidecarFresh(self.resultPath):
+                    try:
+                        writeSidecar(self.resultPath)
+                    except (OSError, ValueError, KeyError) as err:
+                        print('ModelicaResult.loadResult: could not write sidecar,', err)
+                if isSidecarFresh(self.resultPath):
+                    self.dat = SidecarResultFile(getSidecarPath(self.resultPath))
+            if lazy and self.dat == []:
+                try:
+                    self.dat = MatResultFile(self.resultPath)
+                except (ValueError, KeyError) as err: #not a 1.1 trajectory file, let DyMat try
+                    print('ModelicaResult.loadResult: reading with DyMat,', err)
+            if self.dat == []:
+                if DyMat is None:
+                    print('ModelicaResult.loadResult: DyMat is not installed, cannot read', resultFilePath)
+                    return False
+                self.dat = DyMat.DyMatFile(self.resultPath)
+            self._time = None
+            self.indexNames()
             return True
         else:
             print('ModelicaResult.__init__: resultFilePath does not exist, exit', resultFilePath )
             return False
 
+    def indexNames(self): #build the name indices used by the find*Name() methods, once per load
+        self.names = sorted(self.dat.names())
+        self.nameIndex = {n:i for i,n in enumerate(self.names)}
+        self._joinedNames = '\n'.join(self.names)
+        self._nameStarts = []
+        start = 0
+        for n in self.names:
+            self._nameStarts.append(start)
+            start += len(n) + 1
+        self._partialNames = {}
+        self._componentTree = None
+        self._partParents = None
+
+    def getComponentTree(self): #component hierarchy of the names, built on first use after each load
+        """Returns {component: {'children':set(), 'leaves':set()}} where component is a dotted path ('' is the top level),
+        children are the names of its immediate subcomponents and variables, and leaves are the full names of its variables.
+        """
+        if self._componentTree is None:
+            tree = {}
+            partParents = {}
+            for n in self.names:
+                parts = n.split('.')
+                parent = ''
+                for ip,p in enumerate(parts): #B.frameTranslation.height = [B, frameTranslation, height]
+                    node = tree.get(parent)
+                    if node is None:
+                        node = tree[parent] = {'children':set(), 'leaves':set()}
+                    node['children'].add(p)
+                    if ip == len(parts)-1:
+                        node['leaves'].add(n)
+                    parents = partParents.get(p)
+                    if parents is None:
+                        parents = partParents[p] = set()
+                    parents.add(parent)
+                    parent = p if ip == 0 else parent + '.' + p
+            self._componentTree = tree
+            self._partParents = partParents
+        return self._componentTree
+
+    def getComponentChildren(self, component): #names of the immediate subcomponents and variables of component
+        return sorted(self.getComponentTree().get(component, {'children':set()})['children'])
+
+    def getComponentLeaves(self, component): #full names of the variables directly in component
+        return sorted(self.getComponentTree().get(component, {'leaves':set()})['leaves'])
+
     def __str__(self):
         return self.resultPath
 
     def printNames(self, stub=''):
         if self.dat != []:
-            names = list(self.dat.names())
-            names.sort()
+            names = self.names
             if stub == '':
                 pp.pprint(names)
             else:
@@ -44,18 +464,34 @@ class ModelicaResult:
             print('ModelicaResult.dat is empty')
 
     def findName(self, name):
-        names = list(self.dat.names())
-        names.sort()
-        for i in np.arange(len(names)):
-            if name == names[i]:
-                return names[i]
+        if name in self.nameIndex:
+            return name
         # print(f'findName: did not find [{name}] in names')
         return False
 
+    def findPrefixName(self, prefix): #all names starting with prefix, in sorted order, by bisecting the sorted names
+        lo = bisect.bisect_left(self.names, prefix)
+        hi = lo
+        while hi < len(self.names) and self.names[hi].startswith(prefix):
+            hi += 1
+        return self.names[lo:hi]
+
     def findPartialName(self, stub, names=[]): #names=[] searches over self.dat.names()
-        if names == []:
-            names = list(self.dat.names())
-            names.sort()
+        if (names == [] or names is self.names) and isinstance(stub, str):
+            if stub not in self._partialNames: #search the joined names at C speed, mapping each hit back to its name
+                nm = []
+                pos = self._joinedNames.find(stub) if stub and '\n' not in stub else -1
+                while 0 <= pos:
+                    i = bisect.bisect_right(self._nameStarts, pos) - 1
+                    nm.append(self.names[i])
+                    if i+1 == len(self.names):
+                        break
+                    pos = self._joinedNames.find(stub, self._nameStarts[i+1])
+                if stub == '':
+                    nm = list(self.names)
+                self._partialNames[stub] = nm
+            return list(self._partialNames[stub])
+
         nm = []
         for n in names:
             if isinstance(stub, str) and isinstance(n, str) and stub in n:
@@ -66,10 +502,20 @@ class ModelicaResult:
         #     print('findPartialName: did not find [{}] in names'.format(stub))
         return nm
 
-    def findNamesWithFields(self, fields, names=[], verbose=False):
-        if names == []:
-            names = list(self.dat.names())
-            names.sort()
+    def findNamesWithFields(self, fields, names=[], verbose=False): #components having a child whose name contains each of fields, eg ['height','width','density']
+        if names == [] or names is self.names: #answer from the component tree, scanning only the distinct name parts
+            self.getComponentTree()
+            found = set()
+            for ifield,field in enumerate(fields):
+                nnew = set()
+                for p,parents in self._partParents.items():
+                    if field in p:
+                        nnew |= parents
+                found = found & nnew if 0 < ifield else nnew
+                if verbose:
+                    print('c', ifield, field, ':')
+                    pp.pprint(found)
+            return sorted(found)
 
         found = []
         for ifield,field in enumerate(fields):
@@ -96,28 +542,52 @@ class ModelicaResult:
                 pp.pprint(found)
         return found
 
-    def getTime(self):
+    def getTime(self): #the abscissa, extracted once per load
+        if self._time is not None:
+            return self._time
         # if isinstance(self.dat, dict) and self.dat.get('abscissa'):
         if True:
             ret = self.dat.abscissa(2,True)
             if isinstance(ret, np.ndarray):
+                self._time = ret
                 return ret
         print(f'{self.resultPath} has no abscissa, dat is {type(self.dat)}')
         pp.pprint(self.dat)
         return None
 
-    def getIndexAtTime(self, t0=0):
+    def getIndexAtTime(self, t0=0): #index at or just beyond t0; for an array of times returns an array of indices, clipped to the ends
         time = self.getTime()
+        if isinstance(t0, (list, tuple, np.ndarray)):
+            ind = np.searchsorted(time, np.asarray(t0, dtype=float), side='left')
+            return np.minimum(ind, len(time)-1)
         if time[0] <= t0 and t0 <= time[-1]:
-            return np.argmax(t0<=time) #find index at or just beyond t0
+            return np.int64(np.searchsorted(time, t0, side='left')) #find index at or just beyond t0
         else:
             return False
 
-    def getData(self, name, t0=[]):
+    def getData(self, name, t0=[], interpolate=False):
+        """Returns the values of name: all of them, or at t0 which may be a number or an array of times.
+        interpolate=False returns the sample at or just beyond each t0; True linearly interpolates between samples.
+        If name is not found, returns a dict of getData() for every name containing it, or False.
+        """
         nm = self.findName(name)
         # print(nm)
         if nm:
+            if isinstance(t0, (list, tuple, np.ndarray)) and 0 < len(t0): #sample all times in one call
+                dat = self.dat.data(nm)
+                time = self.getTime()
+                t = np.asarray(t0, dtype=float)
+                if len(dat) < len(time): #constants only have start and end
+                    if interpolate:
+                        return np.interp(t, [time[0], time[-1]], dat)
+                    ind = self.getIndexAtTime(t)
+                    return np.where(ind < len(dat), dat[np.minimum(ind, len(dat)-1)], dat[0])
+                if interpolate:
+                    return np.interp(t, time, dat)
+                return dat[self.getIndexAtTime(t)]
             if isinstance(t0, int) or isinstance(t0, float):
+                if interpolate:
+                    return float(self.getData(nm, [t0], interpolate=True)[0])
                 ind = self.getIndexAtTime(t0)
                 if isinstance(ind, np.int64): 
                     dat = (self.dat.data(nm))
@@ -134,7 +604,7 @@ class ModelicaResult:
             if 0 < len(pnames):
                 dat = {} 
                 for pn in pnames:
-                    dat[pn] = self.getData(pn, t0=t0)
+                    dat[pn] = self.getData(pn, t0=t0, interpolate=interpolate)
                 return dat
             else:
                 return False
@@ -142,7 +612,41 @@ class ModelicaResult:
         # print(f'getData did not find name [{name}]')
         return False
 
-    def getVector(self, name, t0=-1):
+    def getDataMatrix(self, names=[], pattern='', regex=False, t0=[], interpolate=False):
+        """Returns (matrix, names): one contiguous float array of shape (len(names), len(time)) and the names of its rows.
+        names=[] list of exact variable names; names not in the result are skipped
+        pattern='' glob over all names, eg 'body*.r_0*' (note [] is a glob character class), or a regular expression if regex=True
+        t0=[] optional array of times to sample at instead of every time step, see getData()
+        Constants (parameters stored with only start and end values) are broadcast over the time axis, as plotTimeVar() does.
+        """
+        sel = []
+        for n in names:
+            if self.findName(n):
+                sel.append(n)
+            else:
+                print(f'getDataMatrix did not find [{n}] in result names')
+        if pattern:
+            if regex:
+                rx = re.compile(pattern)
+                sel += [n for n in self.names if rx.search(n)]
+            else:
+                sel += fnmatch.filter(self.names, pattern)
+
+        time = self.getTime()
+        sample = isinstance(t0, (list, tuple, np.ndarray)) and 0 < len(t0)
+        out = np.empty((len(sel), len(t0) if sample else len(time)), dtype=float)
+        for i,n in enumerate(sel):
+            if sample:
+                out[i] = self.getData(n, t0, interpolate)
+                continue
+            y = self.dat.data(n)
+            if len(y) < len(time): #constants only have start and end
+                out[i] = y[0]
+            else:
+                out[i] = y
+        return out, sel
+
+    def getVector(self, name, t0=-1, interpolate=False): #returns the 3 x time matrix of name[1..3], or its values at t0, which may be an array of times giving a 3 x len(t0) matrix
         namex = self.findName(name+'[1]')
         namey = self.findName(name+'[2]')
         namez = self.findName(name+'[3]')
@@ -155,10 +659,12 @@ class ModelicaResult:
 
         if namex and namey and namez:
             time = self.getTime()
+            if isinstance(t0, (list, tuple, np.ndarray)) and 0 < len(t0):
+                return np.array( [self.getData(namex, t0, interpolate), self.getData(namey, t0, interpolate), self.getData(namez, t0, interpolate)] )
             if t0 < time[0] or time[-1] < t0:  #return a matrix in time x; y; z
                 return np.array( [self.getData(namex), self.getData(namey), self.getData(namez)] )
             else: #return a vector at time t0
-                return np.array( [self.getData(namex, t0), self.getData(namey,t0), self.getData(namez,t0) ] )
+                return np.array( [self.getData(namex, t0, interpolate), self.getData(namey, t0, interpolate), self.getData(namez, t0, interpolate) ] )
 
         print(f'getVector did not find [{name}]: xname[{namex}] yname[{namey}] zname[{namez}] in result names')
         return False
@@ -180,8 +686,7 @@ class ModelicaResult:
         if not ax:
             plt.figure()
             ax = plt.gca()
-        names = list(self.dat.names())
-        names.sort()
+        names = self.nameIndex
 
         xname = ''
         yname = ''
@@ -256,8 +761,7 @@ class ModelicaResult:
         if not ax:
             plt.figure()
             ax = plt.gca()
-        names = list(self.dat.names())
-        names.sort()
+        names = self.nameIndex
 
         xname = ''
         yname = ''
@@ -332,8 +836,7 @@ class ModelicaResult:
             ax = plt.gca()
 
         print(self.dat)
-        names = list(self.dat.names())
-        names.sort()
+        names = self.names
 
         hasFrame = []
         for n in names:
@@ -376,8 +879,7 @@ class ModelicaResult:
         return ax
 
     def plot_bodyBox(self, ax):
-        names = list(self.dat.names())
-        names.sort()
+        names = self.names
 
         # #build tree:
         # tree = []
@@ -389,32 +891,8 @@ class ModelicaResult:
         #bodyBox has variables:
         uvars = ['height','innerHeight', 'width','innerWidth', 'density'] 
 
-    def findBodyBox(self):
-        names = list(self.dat.names())
-        names.sort()
-
-        a = self.findPartialName('height')
-        b = self.findPartialName('innerHeight')
-        c = self.findPartialName('width')
-        d = self.findPartialName('innerWidth')
-        e = self.findPartialName('density')
-        #now, above follow some higher component, so split each and intersect, knowing that the precedent is the component name
-        
-        componentNames = []
-        for an in a:
-            b = an.split('.')
-            for ib in enumerate(b):
-                if b[ib] == 'height':
-                    componentNames.append(b[ib-1])
-        pp.pprint(componentNames)
-                    
-
-            
-
-        
-        # for n in names:
-        #     p = n.splt('.')
-        #     if
+    def findBodyBox(self): #components with the parameters of a BodyBox
+        return self.findNamesWithFields(['height','innerHeight', 'width','innerWidth', 'density'])
 
     #temporal plotting
     def plotTimeVar(self, ax, varName, color='', line='-', linewidth=1, marker='', label=''):
@@ -488,6 +966,86 @@ def gatherResultNames( dirname, fileRegex='.*mat\Z' ):
     print('gathered {} results'.format(len(dats)))
     return dats
 
+def parseOverrideString(resultPath): #recover the parameter dict encoded in a ModelicaSimulateSweep result name, eg 'Model_res_a=1.000e+00,b.c=2.mat' or 'Model_res_a=1.000e+00,b.c=2_17.mat' gives {'a':1.0, 'b.c':2.0}
+    name = os.path.basename(resultPath)
+    if name.endswith('.mat'):
+        name = name[:-4]
+    i = name.find('_res_')
+    if i < 0:
+        return {}
+    pairs = [part.split('=', 1) for part in re.split(r',(?![^\[]*\])', name[i+5:])] #commas inside array indices, eg x[1,2]=3, do not separate pairs
+    if pairs and len(pairs[-1]) == 2 and '_' in pairs[-1][1]: #a suffix keeping alike names apart, eg AnalyzeSweep's point index or ModelicaSimulateAsync's call id
+        value = pairs[-1][1].rsplit('_', 1)[0]
+        if re.fullmatch(r'[-+\d.eE]+|True|False', value): #float() would read the suffix's _ as a digit separator
+            pairs[-1][1] = value
+    params = {}
+    for kv in pairs:
+        if len(kv) == 2:
+            try:
+                params[kv[0]] = float(kv[1])
+            except ValueError:
+                params[kv[0]] = kv[1]
+    return params
+
+def _loadEnsembleMember(args): #Pool task: load one result and return its time and the (len(names), len(time)) rows of names, NaN where a name is missing
+    path, names = args
+    mr = ModelicaResult()
+    try:
+        if not mr.loadResult(path):
+            return path, None, None
+        time = mr.getTime()
+        mat, found = mr.getDataMatrix(names=[n for n in names if mr.findName(n)])
+    except Exception as err: #one unreadable run should not stop the rest of the ensemble
+        print('loadEnsemble: failed to read', path, err)
+        return path, None, None
+    out = np.full((len(names), len(time)), np.nan)
+    rows = {n:i for i,n in enumerate(found)}
+    for i,n in enumerate(names):
+        if n in rows:
+            out[i] = mat[rows[n]]
+    return path, np.array(time), out
+
+def loadEnsemble(results, names, t0=[], nWorkers=None, useProcesses=False, fileRegex='.*mat\Z'): #load names from every result of a sweep into one (nRuns, nNames, nTime) array
+    """results is a directory, searched with fileRegex as gatherResultNames() does, or a list of result paths.
+    Results are read concurrently by nWorkers threads, or processes if useProcesses=True; runs that fail to load are all NaN.
+    Every run is resampled onto t0 if given, otherwise onto the time grid of the first run when the grids differ.
+    Returns a dict of 'data', 'names', 'time', 'files', 'parameters' (parsed from the file names by parseOverrideString()) and 'failed'.
+    """
+    if isinstance(results, str):
+        files = sorted(gatherResultNames(results, fileRegex))
+    else:
+        files = list(results)
+    names = list(names)
+    ensemble = {'data':np.empty((0, len(names), 0)), 'names':names, 'time':np.array(t0, dtype=float), 'files':files,
+                'parameters':[parseOverrideString(f) for f in files], 'failed':[]}
+    if len(files) == 0:
+        return ensemble
+
+    tasks = [(f, names) for f in files]
+    if nWorkers == 1:
+        members = [_loadEnsembleMember(t) for t in tasks]
+    else:
+        with (Pool if useProcesses else ThreadPool)(nWorkers) as pool:
+            members = pool.map(_loadEnsembleMember, tasks, chunksize=max(1, len(tasks) // (4*(nWorkers or os.cpu_count() or 1))))
+
+    grid = ensemble['time']
+    if len(grid) == 0:
+        grid = next((m[1] for m in members if m[1] is not None), np.array([]))
+    data = np.full((len(files), len(names), len(grid)), np.nan)
+    for i,(path, time, mat) in enumerate(members):
+        if time is None:
+            ensemble['failed'].append(path)
+            continue
+        if len(time) == len(grid) and np.array_equal(time, grid):
+            data[i] = mat
+        else:
+            for j in range(len(names)):
+                if not np.isnan(mat[j]).all():
+                    data[i,j] = np.interp(grid, time, mat[j])
+    ensemble['data'] = data
+    ensemble['time'] = grid
+    return ensemble
+
 def getCmap( i, n, alpha=0.5):
     cm = cmap.get_cmap('jet') #cm( [0-1] )
     (r,g,b,a) = cm(i/n)
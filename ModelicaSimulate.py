@@ -13,36 +13,361 @@ import pprint
 import numpy as np
 pp = pprint.PrettyPrinter(indent=2)
 import copy
+import itertools
+import collections
 import re
-from OMPython import OMCSessionZMQ
 import time
+import functools
 import datetime
 import tempfile #create a temporary directory
 import shutil #copying files
+import shlex
+import subprocess #running built models
+import hashlib
+import errno
+import html
+import dataclasses
+import types
+import heapq
+import platform
+import asyncio
+import threading
+import weakref
+import uuid
 import time
 from multiprocessing import Pool
+from multiprocessing.util import Finalize
+
+
+cacheDir = os.environ.get('MODELICASIMULATE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ModelicaSimulate')) #default cache root for new ModelicaScriptingWrappers
+scratchRoot = os.environ.get('MODELICASIMULATE_SCRATCH') or None #default directory for the tempDirs of new ModelicaScriptingWrappers, eg a tmpfs; None uses ./test/ if present, else the system's temp directory
+resultCacheBytes = int(os.environ.get('MODELICASIMULATE_RESULT_CACHE_BYTES', 4*2**30)) #size bound of the result cache under cacheDir/results
+
+def hashFiles(paths): #sha256 over the contents of the given files; a package.mo stands for every file in its package directory
+    h = hashlib.sha256()
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        files = [path]
+        if os.path.basename(path) == 'package.mo':
+            files = []
+            for root, dirs, fnames in os.walk(os.path.dirname(path)):
+                dirs.sort()
+                files += [os.path.join(root, f) for f in sorted(fnames) if f.endswith(('.mo', '.order'))]
+        for f in files:
+            h.update(os.path.relpath(f, os.path.dirname(path)).encode()) #relative, so moved checkouts share entries
+            with open(f, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b''):
+                    h.update(chunk)
+    return h.hexdigest()
+
+defaultSimulationOptions = types.MappingProxyType({'startTime':0, 'stopTime':0.93, 'numberOfIntervals':100, 'tolerance':1e-6}) #used when a model has no experiment() annotation; 210831 dassl not found?
+_annotationCache = {} # content hash : simulation options parsed from the experiment() annotation
+_omcAnnotationCache = {} # (content hash, modelName) : simulation options from OMC's getSimulationOptions()
+_contentHashes = {} # absolute path : (size, mtime_ns, content hash), so unchanged files are not reread
+_experimentPattern = re.compile( r'experiment\s?\((.*)' )
+_experimentFields = [(name, re.compile( r'.*' + name + r'\s?=\s?([\d\w\.\-\+]+)' )) for name in ['StartTime', 'StopTime', 'Interval', 'NumberOfIntervals', 'Tolerance']] + [('Method', re.compile( r'.*Method\s?=\s?[\'"]([\w]+)' ))]
+
+def fileContentHash(filePath): #sha256 of a file's contents, rehashed only when its size or modification time change
+    path = os.path.abspath(os.path.expanduser(filePath))
+    st = os.stat(path)
+    known = _contentHashes.get(path)
+    if known and known[:2] == (st.st_size, st.st_mtime_ns):
+        return known[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _contentHashes[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+def getExperimentAnnotation(filePath): #the simulation options in filePath's experiment() annotation, or defaultSimulationOptions; parsed once per file content and returned read-only
+    key = fileContentHash(filePath)
+    if key in _annotationCache:
+        return _annotationCache[key]
+
+    # simopt = {'startTime':0, 'stopTime':1, 'interval':0.01, 'numberOfIntervals':20, 'tolerance':1e-3, 'method':'dassl'} #sensible defaults
+    simopt = {'startTime':0, 'stopTime':1, 'interval':0.01, 'numberOfIntervals':20, 'tolerance':1e-3 } #210831 dassl not found?
+    with open( filePath, 'r') as file:
+        annotations = _experimentPattern.findall( file.read() ) #the rest of each line from experiment(, then searched for each field
+    found = {}
+    for name, pattern in _experimentFields:
+        for text in annotations:
+            mat = pattern.match(text)
+            if mat:
+                found[name] = mat.group(1)
+                break
+
+    if 'StartTime' in found:
+        simopt['startTime'] = float(found['StartTime'])
+    if 'StopTime' in found:
+        simopt['stopTime'] = float(found['StopTime'])
+    if 'Interval' in found:
+        simopt['interval'] = float(found['Interval'])
+        simopt['numberOfIntervals'] = int( (simopt['stopTime']-simopt['startTime'])/simopt['interval'] )
+    if 'NumberOfIntervals' in found:
+        simopt['numberOfIntervals'] = int(found['NumberOfIntervals'])
+        simopt['interval'] = (simopt['stopTime']-simopt['startTime'])/simopt['numberOfIntervals']
+    if 'Tolerance' in found:
+        simopt['tolerance'] = float(found['Tolerance'])
+    if 'Method' in found:
+        simopt['method'] = found['Method']
+
+    if found:
+        simopt = types.MappingProxyType(simopt)
+    else:
+        simopt = defaultSimulationOptions
+        print('Simulation options not specified, using default: ' + dict(simopt).__str__() + '\n');
+    _annotationCache[key] = simopt
+    return simopt
+
+def overrideValue(value, precise=False): #the text of one -override value; floats are rounded to 4 digits unless precise, see overrideParamDict2String()
+    if isinstance(value, float) and precise:
+        return repr(float(value))
+    if isinstance(value, float):
+        return '{:3.3e}'.format(value)
+    return value
+
+_withinPattern = re.compile( r'^\s*within\s+([\w\.]*)\s*;', re.M )
+_classPattern = re.compile( r'^\s*(?:(?:encapsulated|partial|final|expandable|pure|impure)\s+)*(?:operator\s+)?(?:model|package|block|connector|record|type|function|class|operator)\s+(\w+)', re.M )
+
+def getDefinedClasses(filePath): #the qualified names of the classes filePath declares at the start of a line, a superset of the top-level classes it loads
+    with open( filePath, 'r', errors='replace') as file:
+        text = re.sub(r'//[^\n]*|/\*.*?\*/', '', file.read(), flags=re.S) #the comments, which may mention class keywords
+    within = _withinPattern.search(text)
+    prefix = within.group(1) + '.' if within and within.group(1) else ''
+    return set(prefix + name for name in _classPattern.findall(text) if name != 'end')
+
+@dataclasses.dataclass
+class SolverStatistics: #the ### STATISTICS ### block an OpenModelica simulation logs under LOG_STATS, see parseSolverStatistics()
+    solver: str = ''
+    initializationTime: float = None # seconds, as are the other *Time fields
+    eventHandlingTime: float = None
+    jacobianTime: float = None
+    outputTime: float = None # creating output-file
+    solverTime: float = None # solver (excl. callbacks)
+    simulationTime: float = None
+    totalTime: float = None
+    steps: int = None # steps taken
+    rejectedSteps: int = None # error and convergence test failures
+    errorTestFailures: int = None
+    convergenceTestFailures: int = None
+    functionEvaluations: int = None # calls of functionODE
+    jacobianEvaluations: int = None
+    stateEvents: int = None
+    timeEvents: int = None
+    timers: dict = dataclasses.field(default_factory=dict) # every 'timer' entry and any other timings, by their log text
+    counts: dict = dataclasses.field(default_factory=dict) # every count, by section and log text, eg 'events/state events'
+
+_solverTimers = {'initialization':'initializationTime', 'event-handling':'eventHandlingTime', 'time of jacobian evaluation':'jacobianTime',
+                 'creating output-file':'outputTime', 'solver (excl. callbacks)':'solverTime', 'simulation':'simulationTime', 'total':'totalTime'}
+_solverCounts = {'steps taken':'steps', 'error test failures':'errorTestFailures', 'convergence test failures':'convergenceTestFailures',
+                 'calls of functionODE':'functionEvaluations', 'evaluations of jacobian':'jacobianEvaluations',
+                 'state events':'stateEvents', 'time events':'timeEvents'}
+
+def parseSolverStatistics(messages): #parse the LOG_STATS block of a simulation's messages, in the text or xml log formats, into a SolverStatistics, or None if there is none
+    if '<message' in messages: #-logFormat=xml or xmltcp
+        lines = [html.unescape(t) for t in re.findall(r'<message[^>]*\btext="([^"]*)"', messages)]
+    else: #text lines look like 'LOG_STATS | info | timer' and '|  | |  | | |  0.01s [ 2.0%] initialization'
+        lines = [line.rsplit('|', 1)[-1] for line in messages.splitlines()]
+
+    stats = None
+    section = ''
+    for line in lines:
+        line = line.strip()
+        if stats is None:
+            if line == '### STATISTICS ###':
+                stats = SolverStatistics()
+            continue
+        timer = re.match(r'^([0-9.eE+-]+)s\s*(?:\[\s*[0-9.]+%\]\s*)?(.+)$', line)
+        count = re.match(r'^(\d+)\s+(.+)$', line)
+        if timer:
+            name = timer.group(2).strip()
+            stats.timers[name] = float(timer.group(1))
+            if name in _solverTimers:
+                setattr(stats, _solverTimers[name], float(timer.group(1)))
+        elif count:
+            name = count.group(2).strip()
+            stats.counts[section + '/' + name] = int(count.group(1))
+            if name in _solverCounts:
+                setattr(stats, _solverCounts[name], int(count.group(1)))
+        elif line.startswith('solver:'):
+            section = 'solver'
+            stats.solver = line.split(':', 1)[1].strip()
+        elif line:
+            section = line
+    if stats is not None and (stats.errorTestFailures is not None or stats.convergenceTestFailures is not None):
+        stats.rejectedSteps = (stats.errorTestFailures or 0) + (stats.convergenceTestFailures or 0)
+    return stats
+
+profiles = { # named build and run settings, selected with profile= on simulate(), buildModel() and the Modelica*() functions; add your own entries here
+    'diagnostic':{ #verbose solver logging for finding problems in a model, the original defaults
+        'cflags':'"-Os -fPIC -falign-functions -mfpmath=sse -fno-dollars-in-identifiers"', #note "" include for Modelica
+        'options':'"-v -abortSlowSimulation -steadyState -alarm=10 -logFormat=xmltcp -lv=LOG_INIT,LOG_STATS,LOG_STATS_V,LOG_DEBUG,LOG_SOLVER,LOG_SUCCESS --simplifyLoops --tearingStrictness=veryStrict"',
+        'translationFlags':'--simplifyLoops=1 --tearingStrictness=veryStrict', #set with setCommandLineOptions() while buildModel() translates, as buildModel takes no options
+        'simflags':'-lv=LOG_INIT,LOG_STATS,LOG_STATS_V,LOG_DEBUG,LOG_SOLVER,LOG_SUCCESS -logFormat=xml', #added to every run of the executable, the runtime half of options; xml as xmltcp writes to OMEdit's socket rather than stdout
+        },
+    'throughput':{ #only the LOG_STATS summary, no event points in the results and an optimized build, for sweeps and optimization
+        'cflags':'"-O2 -fPIC -falign-functions -mfpmath=sse -fno-dollars-in-identifiers"',
+        'options':'"-lv=LOG_STATS"',
+        'translationFlags':'',
+        'simflags':'-lv=LOG_STATS -noEventEmit',
+        },
+    }
+
+def modelicaString(text): #quote text as a Modelica string literal, eg for a variableFilter
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def getProfile(profile='diagnostic'): #the settings of the named profile, see profiles
+    if profile not in profiles:
+        print('getProfile: unknown profile [' + str(profile) + '], using diagnostic; the profiles are', list(profiles))
+        return profiles['diagnostic']
+    return profiles[profile]
+
+def makeVariableFilter(outputs=[], dropDerivatives=False): #the OMC variableFilter regular expression selecting the variables written to the result, '' for all of them
+    """outputs=[] variable names to store, where * matches anything, eg ['diffVa', 'body.frame_a.r_0*']; only these are stored, time always is
+    dropDerivatives=False without outputs, leave out the der(...) variables
+    A regular expression cannot exclude parameters by name, so the dropParameters arguments instead remove them from the finished result, see dropResultParameters().
+    """
+    if outputs:
+        return '|'.join(_globToRegex(o) for o in outputs)
+    if dropDerivatives: #POSIX regular expressions have no lookahead, so match every name not starting with der(
+        return '([^d].*|d([^e].*)?|de([^r].*)?|der([^(].*)?)'
+    return ''
+
+def _globToRegex(name): #escape a variable name for a POSIX extended regular expression, keeping * as a wildcard
+    out = ''
+    i = 0
+    while i < len(name):
+        c = name[i]
+        if c == '\\' and name[i+1:i+2] == '*': #an escaped, literal *
+            out += '\\*'
+            i += 1
+        elif c == '*':
+            out += '.*'
+        elif c in '.[]()+?{}|^$\\':
+            out += '\\' + c
+        else:
+            out += c
+        i += 1
+    return out
 
-# sys.path.append('.')
-from ModelicaResult import ModelicaResult
+timingHooks = [] # functions hook(stage, seconds, detail) called after every timed stage, see addTimingHook()
+
+def addTimingHook(hook): #call hook(stage, seconds, detail) after every timed stage, eg to export timings to a metrics system
+    """stage is one of 'loadMSL', 'loadFile', 'checkModel', 'annotation', 'build', 'simulate' (OMC's translate, compile and run), 'run' (an already built executable), 'copyFromTemp' or 'metric' (an AnalyzeSweep metric).
+    detail is the file or model name the stage worked on. Hooks run in the process doing the work, so also in sweep workers when added at import time.
+    """
+    if hook not in timingHooks:
+        timingHooks.append(hook)
+
+def removeTimingHook(hook):
+    if hook in timingHooks:
+        timingHooks.remove(hook)
+
+def _reportTiming(timings, stage, seconds, detail=''): #add seconds to timings[stage] and tell the hooks
+    timings[stage] = timings.get(stage, 0) + seconds
+    for hook in timingHooks:
+        try:
+            hook(stage, seconds, detail)
+        except Exception as err: #metrics export must not break a simulation
+            print('timing hook failed on [' + stage + ']', err)
+
+def _timedStage(stage): #decorator adding the wall time of a wrapper method to self.timings[stage]
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            tstart = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                detail = args[0] if args else ''
+                if isinstance(detail, dict):
+                    detail = detail.get('modelName', '')
+                _reportTiming(self.timings, stage, time.perf_counter() - tstart, str(detail))
+        return timed
+    return decorate
+
+def deliverFile(src, dst, keepSource=False): #put src at dst without copying its contents when both are on one filesystem, returning dst
+    """keepSource=False renames src to dst with os.replace; across filesystems src is copied, then removed
+    keepSource=True copies src, leaving it in place; the copies are independent, as hardlinks would let a write to one change the other, eg a cached result
+    """
+    if keepSource:
+        return shutil.copy2(src, dst)
+
+    try:
+        os.replace(src, dst)
+        return dst
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+    shutil.copy2(src, dst)
+    os.remove(src)
+    return dst
 
 class ModelicaScriptingWrapper: 
     """Wrap the OMC scripting api to stop tripping over formats.  The reference to OMC is the only state.
+    The OMC server and tempDir are only started on first use, so constructing a wrapper is cheap; pass one to ModelicaSimulate() and friends as session= to reuse it.
     """
 
-    omc = {} #reference to the OMC ZMQ server
-    tempDir = {} # temporary directory
-
-    def __init__(self):
-        self.omc = OMCSessionZMQ()  # starts an OMC server, often throws an error if immediately shut down..
-
-        self.tempDir = tempfile.TemporaryDirectory()
-        # print(self.tempDir)
-        # self.tempDir = tempfile.TemporaryDirectory(prefix='ModelicaSimulate_') # leads to relative path crossing drives error https://stackoverflow.com/questions/40448938/valueerror-path-is-on-mount-c-start-on-mount-f-while-django-migrations-i
-        self.tempDir = tempfile.TemporaryDirectory(prefix='ModelicaSimulate_', dir='./test/') 
-        print('made tempDir[' + self.tempDir.name + ']')
-        # self.tempDir = {'name':'test'}
-        self.setWorkingDirectory(self.tempDir.name)
-        # print(self.getWorkingDirectory())
+    _omc = None #reference to the OMC ZMQ server, see omc
+    _tempDir = None # temporary directory, see tempDir
+    tempRoot = None # directory in which tempDir is made, see scratchRoot
+    cacheDir = '' # root of the build cache, '' disables caching
+    omcVersion = ''
+    mslLoaded = False # loadModelicaStandardLibrary() succeeded on this session
+    loadedFiles = {} # absolute path : content hash of the files loaded on this session
+    loadedClasses = {} # absolute path : getDefinedClasses() of each file in loadedFiles
+    checkedModels = {} # modelName : checkInfo of models that passed checkModel() since the last load
+    _omcLock = None # serializes executeAsync() calls on this session
+    timings = {} # stage : seconds spent since the timings were last reset, see addTimingHook()
+    useOMCSimulationOptions = False # read experiment annotations through OMC rather than regular expressions, see getSimulationOptionsFromExperimentAnnotation()
+
+    def __init__(self, tempRoot=None):
+        # tempRoot=None directory in which to make tempDir, defaults to scratchRoot; results are renamed out of it when on the same filesystem as their destination
+        self.cacheDir = cacheDir
+        self.tempRoot = tempRoot or scratchRoot
+        self.loadedFiles = {}
+        self.loadedClasses = {}
+        self.checkedModels = {}
+        self.timings = {}
+
+    @property
+    def omc(self): #the OMC session, started on first use
+        if self._omc is None:
+            from OMPython import OMCSessionZMQ #imported here so that importing this module stays cheap
+            self._omc = OMCSessionZMQ()  # starts an OMC server, often throws an error if immediately shut down..
+            self.setWorkingDirectory(self.tempDir.name)
+            # print(self.getWorkingDirectory())
+        return self._omc
+
+    @property
+    def tempDir(self): #OMC's working directory, made on first use
+        if self._tempDir is None:
+            # self.tempDir = tempfile.TemporaryDirectory(prefix='ModelicaSimulate_') # leads to relative path crossing drives error https://stackoverflow.com/questions/40448938/valueerror-path-is-on-mount-c-start-on-mount-f-while-django-migrations-i
+            root = self.tempRoot
+            if root is None and os.path.isdir('./test/'):
+                root = './test/'
+            if root is not None:
+                os.makedirs(root, exist_ok=True)
+            self._tempDir = tempfile.TemporaryDirectory(prefix='ModelicaSimulate_', dir=root)
+            print('made tempDir[' + self._tempDir.name + ']')
+        return self._tempDir
+
+    def isStarted(self): #True once the OMC server has been started
+        return self._omc is not None
+
+    def close(self): #stop the OMC server and remove tempDir; the wrapper restarts both if used again
+        if self._omc is not None:
+            try:
+                self._omc.sendExpression('quit()')
+            except Exception as err:
+                print('close: OMC did not quit cleanly', err)
+            self._omc = None
+            self.mslLoaded = False
+            self.loadedFiles = {}
+            self.loadedClasses = {}
+            self.checkedModels = {}
+        if self._tempDir is not None:
+            self._tempDir.cleanup()
+            self._tempDir = None
 
     def getModelicaPath(self):
         ret = self.omc.sendExpression('getModelicaPath()')
@@ -78,11 +403,26 @@ class ModelicaScriptingWrapper:
             print('getRelative: path[{0}] does not exist'.format(path))
             return False
 
-    def loadModelicaStandardLibrary(self): #load the ModelicaStandardLibrary installed with OMC
+    @_timedStage('loadMSL')
+    def loadModelicaStandardLibrary(self, force=False): #load the ModelicaStandardLibrary installed with OMC, once per session unless force
+        if self.mslLoaded and not force:
+            return True
         ret = self.omc.sendExpression('loadModel(Modelica)')
+        if ret:
+            self.mslLoaded = True
+            self.checkedModels = {}
         return ret
 
-    def loadFile(self, filePath): #load some other *.mo file, True = load success, False = failed
+    @_timedStage('loadFile')
+    def loadFile(self, filePath, force=False): #load some other *.mo file, True = load success, False = failed; files already loaded with the same contents are skipped unless force
+        # a file redefining classes of an earlier file replaces them in OMC, so the earlier file is no longer skipped, see getDefinedClasses()
+        absPath = os.path.abspath(os.path.expanduser(filePath))
+        fileHash = ''
+        if os.path.exists(absPath):
+            fileHash = hashFiles([absPath])
+            if not force and self.loadedFiles.get(absPath) == fileHash:
+                return True
+
         relPath = self.getRelativePathFromWorkingDirectory( filePath ) #file path must be RELATIVE to Modelica's working directory, absolute do not work
         if relPath:
             ret = self.omc.sendExpression('loadFile("./{0}")'.format( relPath ) )
@@ -94,6 +434,16 @@ class ModelicaScriptingWrapper:
 
         if ret is False :
             print('loadFile [' + filePath +'] failed')
+            self.loadedFiles.pop(absPath, None)
+            self.loadedClasses.pop(absPath, None)
+        else:
+            classes = getDefinedClasses(absPath) if fileHash else set()
+            for path in [p for p,c in self.loadedClasses.items() if p != absPath and c & classes]: #overwritten in OMC by this file
+                self.loadedFiles.pop(path, None)
+                self.loadedClasses.pop(path, None)
+            self.loadedFiles[absPath] = fileHash
+            self.loadedClasses[absPath] = classes
+            self.checkedModels = {} #the loaded classes changed
 
         return ret
 
@@ -113,11 +463,17 @@ class ModelicaScriptingWrapper:
         print('getModelParameterValue() returned', ret, 'probably failed for ?reasons?')
         return ret
 
-    def checkModel(self, modelName): #check the already-loaded model file for errors
+    @_timedStage('checkModel')
+    def checkModel(self, modelName, force=False): #check the already-loaded model file for errors; successful checks are remembered until a file is (re)loaded
+        if not force and modelName in self.checkedModels:
+            return self.checkedModels[modelName]
         checkModelString = self.omc.sendExpression('checkModel({0})'.format(modelName))
         # pp.pprint(checkModelString)
         # print descriptive error messages
-        return self.parseCheckModelString( checkModelString )
+        checkInfo = self.parseCheckModelString( checkModelString )
+        if checkInfo['success']:
+            self.checkedModels[modelName] = checkInfo
+        return checkInfo
 
     def parseCheckModelString(self, checkModelString):
         checkInfo = {}
@@ -161,75 +517,301 @@ class ModelicaScriptingWrapper:
         # print('getErrorString()', ret)
         return ret
 
-    def buildModel(self, modelName, buildOptions):
-        if buildOptions == None:
-            # return {'startTime':0, 'stopTime':1, 'numberOfIntervals':100, 'tolerance':1e-3, 'method':'\"dassl\"', 'cflags':'\"--debug\"' } #210831 dassl not found by omc...?
-            return {'startTime':0, 'stopTime':1, 'numberOfIntervals':100, 'tolerance':1e-3, 'cflags':'\"--debug\"' }
-        cmd = {'command':'buildModel', 'modelName':modelName, 'separateByCommas':buildOptions }
-        ret = self.executeCommand( cmd ) #buildModel returns a tuple for some lame reason, really need to fix OMPython
+    def getBuildCommandDict(self, modelName, simOptions=None, profile='diagnostic'): #the buildModel command for modelName, filling in the defaults used by simulate()
+        if simOptions is None:
+            simOptions = {'startTime':0, 'stopTime':1, 'numberOfIntervals':100, 'tolerance':1e-3}
+        cmd = dict(simOptions) #the simulation options are written into the _init.xml, overrides are given per run
+        cmd.pop('simflags', None)
+        cmd.pop('options', None)
+        cmd['command'] = 'buildModel'
+        cmd['modelName'] = modelName
+        if not cmd.get('method'):
+            cmd['method'] = '"dassl"'
+        if not cmd.get('cflags'):
+            cmd['cflags'] = getProfile(profile)['cflags']
+        return cmd
 
-        print('buildModel: [{}], returned'.format(cmd))
+    @_timedStage('build')
+    def buildModel(self, modelName, simOptions=None, cacheKey='', profile='diagnostic'): #translate and compile the already-loaded model without running it, see runExecutable()
+        """Build modelName into a simulation executable.
+        simOptions=None options as for simulate(), written into the model's _init.xml
+        cacheKey='' if given, the executable and _init.xml are stored under this key in the build cache, see getBuildCacheKey()
+        profile='diagnostic' the profiles entry giving the cflags, and the simflags runExecutable() uses for every run of this build
+        Returns {'modelExecutablePath', 'modelXMLPath', 'modelName', 'profile', 'simflags', 'success'}.
+        """
+        cmd = self.getBuildCommandDict(modelName, simOptions, profile)
+        previousFlags = self.setTranslationFlags( getProfile(profile).get('translationFlags', '') )
+        try:
+            ret = self.executeCommand( cmd ) #buildModel returns a tuple for some lame reason, really need to fix OMPython
+        finally:
+            if previousFlags is not None:
+                self.restoreTranslationFlags( previousFlags )
+
+        print('buildModel: [{}], returned'.format(ret['command']))
         pp.pprint(ret)
 
-        if isinstance(ret['executeCommand'], tuple):
-            return {'modelExecutablePath': ret['executeCommand'][0], 'modelXMLPath':ret['executeCommand'][1], 'success':True}
+        if isinstance(ret.get('executeCommand'), tuple) and ret['executeCommand'][0]:
+            #paths are relative to OMC's working directory
+            exePath = os.path.join(self.tempDir.name, ret['executeCommand'][0])
+            if not os.path.exists(exePath) and os.path.exists(exePath + '.exe'):
+                exePath += '.exe'
+            xmlPath = os.path.join(self.tempDir.name, ret['executeCommand'][1])
+            buildInfo = {'modelExecutablePath':os.path.abspath(exePath), 'modelXMLPath':os.path.abspath(xmlPath), 'modelName':modelName,
+                         'profile':profile, 'simflags':getProfile(profile)['simflags'], 'success':True}
+            if cacheKey and self.cacheDir:
+                buildInfo = self.storeBuild(cacheKey, buildInfo)
+            return buildInfo
         else:
+            print('buildModel:', self.getErrorString())
             return {'success':False}
 
-    def getSimulationOptionsFromExperimentAnnotation(self, filePath): #if filePath is to an overall package, this fails
-        #read the simulation options from the experiment() annotation
-        # simopt = {'startTime':0, 'stopTime':1, 'interval':0.01, 'numberOfIntervals':20, 'tolerance':1e-3, 'method':'dassl'} #sensible defaults
-        simopt = {'startTime':0, 'stopTime':1, 'interval':0.01, 'numberOfIntervals':20, 'tolerance':1e-3 } #210831 dassl not found?
-        # simopt = {'startTime':0, 'stopTime':1, 'interval':0.01, 'numberOfIntervals':20, 'tolerance':1e-3, 'solver':'dassl'} #sensible defaults
-        simoptSetFromExperiment = False
-
-        with open( filePath, 'r') as file:
-            mtxt = file.read()
-            # pp.pprint(mtxt)
-
-            mat = re.findall( r'experiment\s?\(.*StartTime\s?=\s?([\d\w\.\-\+]+)', mtxt )
-            if mat:
-                simopt['startTime'] = float(mat[0])
-                simoptSetFromExperiment = True
-            mat = re.findall( r'experiment\s?\(.*StopTime\s?=\s?([\d\w\.\-\+]+)', mtxt )
-            if mat:
-                simopt['stopTime'] = float(mat[0])
-                simoptSetFromExperiment = True
-
-            mat = re.findall( r'experiment\s?\(.*Interval\s?=\s?([\d\w\.\-\+]+)', mtxt )
-            if mat:
-                simopt['interval'] = float(mat[0])
-                simopt['numberOfIntervals'] = int( (simopt['stopTime']-simopt['startTime'])/simopt['interval'] )
-                simoptSetFromExperiment = True
-
-            mat = re.findall( r'experiment\s?\(.*NumberOfIntervals\s?=\s?([\d\w\.\-\+]+)', mtxt )
-            if mat:
-                simopt['interval'] = (simopt['stopTime']-simopt['startTime'])/simopt['numberOfIntervals']
-                simopt['numberOfIntervals'] = int(mat[0])
-                simoptSetFromExperiment = True
-
-            mat = re.findall( r'experiment\s?\(.*Tolerance\s?=\s?([\d\w\.\-\+]+)', mtxt )
-            if mat:
-                simopt['tolerance'] = float(mat[0])
-                simoptSetFromExperiment = True
-
-            mat = re.findall( r'experiment\s?\(.*Method\s?=\s?[\'"]([\w]+)', mtxt )
-            if mat:
-                simopt['method'] = mat[0]
-                simoptSetFromExperiment = True
-
-        if (not simoptSetFromExperiment and len(sys.argv) != 3):
-            # simopt = {'startTime':0, 'stopTime':0.93, 'numberOfIntervals':100, 'tolerance':1e-6, 'method':'dassl'}
-            simopt = {'startTime':0, 'stopTime':0.93, 'numberOfIntervals':100, 'tolerance':1e-6} #210831 dassl not found?
-            print('Simulation options not specified, using default: ' + simopt.__str__() + '\n');
-
-        if (not simoptSetFromExperiment and len(sys.argv) == 3):
-            simopt = json.loads( sys.argv[2] ) #simopt always has all simulation options!
-            print('Simulation options specified on command line: ' + simopt.__str__() + '\n');
-
-        return simopt
+    def setTranslationFlags(self, flags): #set OMC compiler flags, eg '--tearingStrictness=veryStrict', returning the options they replace for restoreTranslationFlags(), or None if flags is ''
+        if not flags:
+            return None
+        previous = self.omc.sendExpression('getCommandLineOptions()')
+        if not self.omc.sendExpression('setCommandLineOptions("' + flags + '")'):
+            print('setTranslationFlags: OMC rejected [' + flags + ']', self.getErrorString())
+        return previous
+
+    def restoreTranslationFlags(self, previous): #undo setTranslationFlags(), so later builds on this session get OMC's options again
+        self.omc.sendExpression('clearCommandLineOptions()')
+        if isinstance(previous, (list, tuple)) and previous:
+            self.omc.sendExpression('setCommandLineOptions("' + ' '.join(previous) + '")')
+
+    def getVersion(self): #the OMC version string, eg 'OpenModelica 1.22.0', asking `omc --version` rather than starting a session
+        if not self.omcVersion:
+            omcPath = shutil.which('omc')
+            if os.environ.get('OPENMODELICAHOME'):
+                omcPath = shutil.which('omc', path=os.path.join(os.environ['OPENMODELICAHOME'], 'bin')) or omcPath
+            if omcPath:
+                try:
+                    self.omcVersion = subprocess.run([omcPath, '--version'], capture_output=True, text=True, timeout=60).stdout.strip()
+                except (OSError, subprocess.SubprocessError) as err:
+                    print('getVersion: [' + omcPath + ' --version] failed', err)
+            if not self.omcVersion:
+                self.omcVersion = self.omc.sendExpression('getVersion()')
+        return self.omcVersion
+
+    def getBuildCacheKey(self, modelPath, modelName, libraryPaths=[], simOptions=None, profile='diagnostic'): #hash of everything that determines the built executable
+        h = hashlib.sha256()
+        h.update(hashFiles([modelPath] + list(libraryPaths)).encode())
+        h.update(self.getVersion().encode())
+        h.update(platform.platform().encode())
+        h.update(json.dumps(self.getBuildCommandDict(modelName, simOptions, profile), sort_keys=True, default=str).encode())
+        h.update(getProfile(profile)['simflags'].encode()) #stored with the build for runExecutable()
+        h.update(getProfile(profile).get('translationFlags', '').encode())
+        return h.hexdigest()
+
+    def getCachedBuild(self, cacheKey): #returns the buildInfo stored under cacheKey, or None
+        if not self.cacheDir:
+            return None
+        infoPath = os.path.join(self.cacheDir, 'build', cacheKey, 'buildInfo.json')
+        if not os.path.exists(infoPath):
+            return None
+        with open(infoPath, 'r') as f:
+            buildInfo = json.load(f)
+        if not os.path.exists(buildInfo['modelExecutablePath']) or not os.path.exists(buildInfo['modelXMLPath']):
+            return None
+        buildInfo['cached'] = True
+        return buildInfo
+
+    def storeBuild(self, cacheKey, buildInfo): #copy the executable and its runtime files into the build cache, returning the buildInfo of the cached copy
+        buildDir = os.path.dirname(buildInfo['modelExecutablePath'])
+        modelName = buildInfo['modelName']
+        entry = os.path.join(self.cacheDir, 'build', cacheKey)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            staging = tempfile.mkdtemp(prefix='.' + cacheKey[:8], dir=os.path.dirname(entry)) #fill then rename, so readers never see a partial entry
+            for f in [buildInfo['modelExecutablePath'], buildInfo['modelXMLPath'], os.path.join(buildDir, modelName + '_info.json')]:
+                if os.path.exists(f):
+                    shutil.copy2(f, staging)
+            cached = dict(buildInfo)
+            cached['modelExecutablePath'] = os.path.join(entry, os.path.basename(buildInfo['modelExecutablePath']))
+            cached['modelXMLPath'] = os.path.join(entry, os.path.basename(buildInfo['modelXMLPath']))
+            with open(os.path.join(staging, 'buildInfo.json'), 'w') as f:
+                json.dump(cached, f, indent=2)
+            try:
+                os.rename(staging, entry)
+            except OSError: #another process stored this key first
+                shutil.rmtree(staging, ignore_errors=True)
+            return cached
+        except OSError as err:
+            print('storeBuild: could not cache [' + buildInfo['modelExecutablePath'] + ']', err)
+            return buildInfo
+
+    def getResultCacheKey(self, modelPath, modelName, libraryPaths=[], modelParameters={}, simOptions=None, profile='diagnostic', outputFilter=None, precise=False): #hash of everything that determines a simulation result
+        # outputFilter=None the outputs, dropDerivatives and dropParameters arguments restricting the stored variables, if any
+        # precise=False whether modelParameters are passed at full precision, as the key hashes the values the executable is given, see overrideValue()
+        h = hashlib.sha256()
+        h.update(self.getBuildCacheKey(modelPath, modelName, libraryPaths, simOptions, profile).encode())
+        h.update(json.dumps({k:overrideValue(v, precise) for k,v in modelParameters.items()}, sort_keys=True, default=str).encode())
+        if outputFilter:
+            h.update(json.dumps(outputFilter, default=str).encode())
+        return h.hexdigest()
+
+    def getCachedResult(self, cacheKey): #returns the path of the cached result for cacheKey, or ''
+        if not self.cacheDir:
+            return ''
+        rpath = os.path.join(self.cacheDir, 'results', cacheKey + '.mat')
+        if not os.path.exists(rpath):
+            return ''
+        os.utime(rpath) #mtime marks the last use for evictResults()
+        return rpath
+
+    def storeResult(self, cacheKey, resultFile): #copy resultFile into the result cache under cacheKey, then evict the least recently used results
+        resultDir = os.path.join(self.cacheDir, 'results')
+        try:
+            os.makedirs(resultDir, exist_ok=True)
+            fd, staging = tempfile.mkstemp(prefix='.' + cacheKey[:8], dir=resultDir)
+            os.close(fd)
+            shutil.copy2(resultFile, staging) #a copy, so writing to the delivered result cannot change the cache
+            os.replace(staging, os.path.join(resultDir, cacheKey + '.mat'))
+            os.utime(os.path.join(resultDir, cacheKey + '.mat'))
+        except OSError as err:
+            print('storeResult: could not cache [' + resultFile + ']', err)
+            return False
+        self.evictResults()
+        return True
+
+    def evictResults(self, maxBytes=None): #delete the least recently used cached results until the result cache is under maxBytes
+        if maxBytes is None:
+            maxBytes = resultCacheBytes
+        resultDir = os.path.join(self.cacheDir, 'results')
+        entries = []
+        for e in os.scandir(resultDir):
+            if e.name.endswith('.mat') and not e.name.startswith('.'):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort() #oldest first
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in entries:
+            if total <= maxBytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError: #already evicted by another process
+                pass
+        return total
+
+    @_timedStage('run')
+    def runExecutable(self, buildInfo, modelParameters={}, resultFile='', simflags='', variableFilter='', precise=False): #run an executable from buildModel() with -override, writing resultFile into tempDir
+        """Run the simulation executable made by buildModel() without recompiling.
+        buildInfo -- the return from buildModel()
+        modelParameters={} parameters to override for this run, eg {'cor':0.5}
+        resultFile='' name of the result file in tempDir, defaults to <modelName>_res.mat
+        simflags='' further simulation flags, eg '-lv=LOG_STATS', after the simflags of the build's profile
+        variableFilter='' regular expression of the variables to store in the result, see makeVariableFilter(); '' stores all of them
+        precise=False pass float modelParameters rounded to 4 digits as the sweeps name them, True at full precision, see overrideParamDict2String()
+        Returns a simInfo dict like simulate().
+        """
+        outputDir = os.path.abspath(self.tempDir.name)
+        cmd, resultPath = self._executableCommand(buildInfo, modelParameters, resultFile, simflags, outputDir, variableFilter, precise)
+        try:
+            proc = subprocess.run(cmd, cwd=outputDir, capture_output=True, text=True)
+        except OSError as err:
+            print('runExecutable: could not start [' + cmd[0] + ']', err)
+            return {'command':' '.join(cmd), 'success':False, 'resultFile':'', 'messages':''}
+        return self._executableResult(buildInfo, cmd, proc.returncode, proc.stdout + proc.stderr, resultPath, outputDir)
+
+    async def runExecutableAsync(self, buildInfo, modelParameters={}, resultFile='', simflags='', timeout=None, variableFilter='', precise=False): #runExecutable() as an asyncio subprocess in its own directory under tempDir, so many can run at once
+        """As runExecutable(), but awaitable and safe to run concurrently: each run writes into a new directory under tempDir.
+        timeout=None seconds after which the run is killed and returned with success False and 'timedOut' True
+        Cancelling the awaiting task kills the run.
+        """
+        tstart = time.perf_counter()
+        outputDir = tempfile.mkdtemp(prefix='run_', dir=os.path.abspath(self.tempDir.name))
+        cmd, resultPath = self._executableCommand(buildInfo, modelParameters, resultFile, simflags, outputDir, variableFilter, precise)
+        try:
+            proc = await asyncio.create_subprocess_exec(*cmd, cwd=outputDir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        except OSError as err:
+            print('runExecutableAsync: could not start [' + cmd[0] + ']', err)
+            return {'command':' '.join(cmd), 'success':False, 'resultFile':'', 'messages':'', 'outputDir':outputDir}
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            print('runExecutableAsync: killed after [' + str(timeout) + ']s', ' '.join(cmd))
+            return {'command':' '.join(cmd), 'success':False, 'resultFile':'', 'messages':'', 'outputDir':outputDir, 'timedOut':True}
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            shutil.rmtree(outputDir, ignore_errors=True)
+            raise
+        simInfo = self._executableResult(buildInfo, cmd, proc.returncode, out.decode(errors='replace'), resultPath, outputDir)
+        simInfo['timings'] = {} #concurrent runs share self.timings, so time this run on its own
+        _reportTiming(simInfo['timings'], 'run', time.perf_counter() - tstart, buildInfo['modelName'])
+        return simInfo
+
+    def _executableCommand(self, buildInfo, modelParameters, resultFile, simflags, outputDir, variableFilter='', precise=False): #the command line for runExecutable(), and its result path
+        if resultFile == '':
+            resultFile = buildInfo['modelName'] + '_res.mat'
+        resultPath = os.path.join(outputDir, resultFile)
+
+        cmd = [buildInfo['modelExecutablePath'],
+               '-inputPath=' + os.path.dirname(buildInfo['modelXMLPath']), #read the _init.xml from the build directory
+               '-outputPath=' + outputDir,
+               '-r=' + resultPath]
+        if variableFilter: #the filter may hold commas, which -override would split on
+            cmd.append('-overrideFile=' + self.writeOverrideFile( dict(modelParameters, variableFilter=variableFilter), outputDir, precise ))
+        elif modelParameters:
+            overstring = self.overrideParamDict2String( modelParameters, precise )
+            if len(overstring) < 2000:
+                cmd.append('-override=' + overstring)
+            else: #long override lists exceed the command line
+                cmd.append('-overrideFile=' + self.writeOverrideFile( modelParameters, outputDir, precise ))
+        cmd += shlex.split(buildInfo.get('simflags', '')) + shlex.split(simflags)
+        return cmd, resultPath
+
+    def _executableResult(self, buildInfo, cmd, returnCode, messages, resultPath, outputDir): #the simInfo of a finished runExecutable()
+        simDict = {'command':' '.join(cmd), 'messages':messages, 'returnCode':returnCode, 'resultFile':resultPath, 'outputDir':outputDir, 'profile':buildInfo.get('profile', '')}
+        with open(os.path.join(outputDir, buildInfo['modelName'] + '.log'), 'w') as f: #as simulate() leaves for copyFromTemp()
+            f.write(simDict['messages'])
+        a = re.search(r'LOG_SUCCESS', simDict['messages'])
+        simDict['success'] = returnCode == 0 and a is not None and os.path.exists(resultPath)
+        simDict['solverStatistics'] = parseSolverStatistics(simDict['messages'])
+        if not simDict['success']:
+            simDict['resultFile'] = ''
+        return simDict
 
-    def getSimulateCommandDict(self):
+    async def executeAsync(self, method, *args): #await a blocking wrapper method, eg self.simulate, on a thread, one OMC call at a time per session
+        if self._omcLock is None:
+            self._omcLock = threading.Lock()
+        def locked():
+            with self._omcLock: #the ZMQ session is not thread safe
+                return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, locked)
+
+    async def simulateAsync(self, modelName, simOptions): #simulate() without blocking the event loop
+        return await self.executeAsync(self.simulate, modelName, simOptions)
+
+    @_timedStage('annotation')
+    def getSimulationOptionsFromExperimentAnnotation(self, filePath, modelName='', useOMC=None): #if filePath is to an overall package, this fails
+        """Read the simulation options from the experiment() annotation, parsing each file content once; see getExperimentAnnotation().
+        modelName='' the model whose annotation OMC reads when useOMC
+        useOMC=None ask OMC's getSimulationOptions(modelName) instead of matching the text, exact where the regular expressions fail, eg for packages; None uses the session's useOMCSimulationOptions
+        Returns a read-only mapping shared between callers, copy it with dict() to change it.
+        """
+        if useOMC is None:
+            useOMC = self.useOMCSimulationOptions
+        if useOMC and modelName:
+            key = (fileContentHash(filePath), modelName)
+            if key not in _omcAnnotationCache:
+                if not self.loadFile(filePath):
+                    print('getSimulationOptionsFromExperimentAnnotation: could not load [' + filePath + '] into OMC, matching the text instead')
+                    return getExperimentAnnotation(filePath)
+                ret = self.omc.sendExpression('getSimulationOptions(' + modelName + ')')
+                if not (isinstance(ret, tuple) and len(ret) == 5):
+                    print('getSimulationOptionsFromExperimentAnnotation: OMC returned [' + str(ret) + '] for [' + modelName + '], matching the text instead')
+                    return getExperimentAnnotation(filePath)
+                startTime, stopTime, tolerance, numberOfIntervals, interval = ret
+                _omcAnnotationCache[key] = types.MappingProxyType({'startTime':startTime, 'stopTime':stopTime, 'interval':interval, 'numberOfIntervals':int(numberOfIntervals), 'tolerance':tolerance})
+            return _omcAnnotationCache[key]
+        return getExperimentAnnotation(filePath)
+
+    def getSimulateCommandDict(self, profile='diagnostic'):
+        settings = getProfile(profile)
         cmdDict = {'command':'simulate',
                 'modelName':'BouncingBall',
                 'startTime':0,
@@ -239,8 +821,8 @@ class ModelicaScriptingWrapper:
                 # 'method':'\"dassl\"',
                 # 'outputFormat':'\"mat\"',
                 # 'cflags':'\"--debug\"',
-                'cflags':'"-Os -fPIC -falign-functions -mfpmath=sse -fno-dollars-in-identifiers"',
-                'options':'\"-v -abortSlowSimulation -steadyState -alarm=10 -logFormat=xml -lv=LOG_INIT --simplifyLoops\"', #note "" include for Modelica
+                'cflags':settings['cflags'],
+                'options':settings['options'], #note "" include for Modelica
                 }
         return cmdDict
 
@@ -281,7 +863,10 @@ class ModelicaScriptingWrapper:
             retDict['success'] = True
         return retDict
 
-    def simulate(self, modelName, simOptions): #={'startTime':0, 'stopTime':1, 'numberOfIntervals':20, 'tolerance':1e-3, 'method':'dassl'}):
+    @_timedStage('simulate')
+    def simulate(self, modelName, simOptions, profile='diagnostic', outputs=[], dropDerivatives=False): #={'startTime':0, 'stopTime':1, 'numberOfIntervals':20, 'tolerance':1e-3, 'method':'dassl'}):
+        # profile='diagnostic' the profiles entry filling in cflags and options not given in simOptions; its simflags come before any given in simOptions
+        # outputs=[], dropDerivatives=False restrict the stored variables unless simOptions has a variableFilter, see makeVariableFilter()
         simOptions['command'] = 'simulate'
         simOptions['modelName'] = modelName
 
@@ -291,11 +876,16 @@ class ModelicaScriptingWrapper:
         #     simOptions['solver'] = '"dassl"'
         # if not simOptions.get('outputFormat'):
         #     simOptions['outputFormat'] = '"mat"'
+        settings = getProfile(profile)
         if not simOptions.get('cflags'):
             # simOptions['cflags'] = '"--debug"'
-            simOptions['cflags'] = '"-Os -fPIC -falign-functions -mfpmath=sse -fno-dollars-in-identifiers"'#note "" include for Modelica
+            simOptions['cflags'] = settings['cflags']
         if not simOptions.get('options'):
-            simOptions['options'] = '"-v -abortSlowSimulation -steadyState -alarm=10 -logFormat=xmltcp -lv=LOG_INIT,LOG_STATS,LOG_STATS_V,LOG_DEBUG,LOG_SOLVER,LOG_SUCCESS --simplifyLoops --tearingStrictness=veryStrict"' #note "" include for Modelica
+            simOptions['options'] = settings['options']
+        if settings['simflags']: #as runExecutable(), the caller's simflags follow the profile's
+            simOptions['simflags'] = '"' + (settings['simflags'] + ' ' + simOptions.get('simflags', '').strip('"')).strip() + '"'
+        if not simOptions.get('variableFilter') and (outputs or dropDerivatives):
+            simOptions['variableFilter'] = modelicaString(makeVariableFilter(outputs, dropDerivatives))
 
         # print('MSW.simulate.simOptions', simOptions )
         # cd['simflags'] = '\"-override R=1.35,Lw=6e-3\"'
@@ -306,6 +896,7 @@ class ModelicaScriptingWrapper:
 
         if simDict is None:
             return {'success':False}
+        simDict['profile'] = profile
         if not simDict.get('messages'):
             return simDict
 
@@ -314,6 +905,7 @@ class ModelicaScriptingWrapper:
             simDict['success'] = True
         else:
             simDict['success'] = False
+        simDict['solverStatistics'] = parseSolverStatistics(simDict['messages'])
 
         return simDict
 
@@ -325,35 +917,8 @@ class ModelicaScriptingWrapper:
             # paramDict.update(makeParameterStartStopLogN('ra_dRotor', -2, 1, 30)) #
             # paramDict.update(makeParameterStartStopInc('J', 1e-5, 1e-4,  1e-5)) #2e-5 in model
 
-        # print('elaborateParamList', paramDict)
-        lst = []
-        for key in paramDict:
-            pl = paramDict[key]
-            if pl.get('increment'):
-                pl['range'] = np.arange(pl['start'], pl['stop'], pl['increment'] )
-
-            if pl.get('n'):
-                if pl['n'] == 1:
-                    pl['range'] = np.array([pl['start']])
-                else:
-                    pl['range'] = np.linspace(pl['start'], pl['stop'], pl['n'] )
-
-            if pl.get('logN'):
-                if pl['logN'] == 1:
-                    pl['range'] = np.array([pl['start']])
-                else:
-                    pl['range'] = np.logspace(pl['start'], pl['stop'], pl['logN'] )
-
-            # print(pl['range'].size)
-            if 0<pl['range'].size:
-                lst = self.elaborateRangesDict( lst, key=key, rng=pl['range'] )
-            else:
-                print(f"failed to make range for [{key}] from [{pl['start']}] to [{pl['stop']}] inc[{pl['increment']}]")
-                for l in lst:
-                    l.update({key: pl['start']})
-        # pp.pprint(lst)
-        # print('elaborateParamList: len(lst)=', len(lst))
-        return lst
+        # for large sweeps iterate over iterateParamList(paramDict) instead of building the list
+        return list(iterateParamList(paramDict))
 
     def elaborateRangesDict(self, lst, key, rng): #create a new list with every element in rng added to lst
         if len(lst) == 0:
@@ -365,36 +930,37 @@ class ModelicaScriptingWrapper:
             ret = []
             for l in lst:
                 for r in rng:
-                    a = copy.deepcopy(l)
+                    a = dict(l) #the values are numbers, a shallow copy suffices
                     a[key] = r
                     ret.append( a )
             return ret
 
-    def overrideParamDict2String(self, over):
+    def overrideParamDict2String(self, over, precise=False):
+        # precise=False floats are rounded to 4 digits, which suits file names; True gives them at full precision, as an optimizer needs
         overout = ''
         for key in over:
             # overout += '{}={}, '.format(key, over[key])
-            val = over[key]
-            if isinstance(val, float):
-                overout += '{}={:3.3e},'.format(key, over[key])
-            else:
-                overout += '{}={},'.format(key, over[key])
+            overout += '{}={},'.format(key, overrideValue(over[key], precise))
         return overout[:-1] #remove trailing [, ]
 
-    def writeOverrideFile(self, paramDict ): #write an overrideFile for overriding model parameters
+    def writeOverrideFile(self, paramDict, outputDir='', precise=False ): #write an overrideFile for overriding model parameters
         #https://www.openmodelica.org/doc/OpenModelicaUsersGuide/latest/simulationflags.html#simflag-override
         # paramDict = {'cor':0.1, 'h':1'}
+        # outputDir='' directory of the file, defaults to tempDir
+        # precise=False round floats as overrideParamDict2String() does, so a run gets the same values whether they go by -override or -overrideFile
         # returns override path
-        opath = os.path.join( self.tempDir.name, 'override.txt')
+        opath = os.path.join( outputDir or os.path.abspath(self.tempDir.name), 'override.txt')
         with open(opath, 'w' ) as f:
             for key in paramDict:
-                f.write('{}={}'.format(key, paramDict[key] ))
+                f.write('{}={}\n'.format(key, overrideValue(paramDict[key], precise) ))
 
         return opath
 
-    def copyFromTemp(self, fileName, newName='', newPath='./'): #copy files from the temporary directory to python's current directory
+    @_timedStage('copyFromTemp')
+    def copyFromTemp(self, fileName, newName='', newPath='./', keepSource=False): #move files from the temporary directory to python's current directory, copying only across filesystems
+        # keepSource=True leave fileName in tempDir as well, see deliverFile()
         fpath = os.path.join(self.tempDir.name, fileName)
-        if os.path.exists(os.path.join(newPath,newName)):
+        if newName != '':
             npath = os.path.join(newPath, newName)
         else:
             npath = os.path.join(newPath, os.path.basename(fileName))
@@ -407,7 +973,7 @@ class ModelicaScriptingWrapper:
 
         if os.path.exists(fpath):
             try:
-                return shutil.copy2( fpath, npath  ) #returns the new paht
+                return deliverFile( fpath, npath, keepSource ) #returns the new paht
             except OSError as err:
                 print('caught OSError copying ['+ fpath+ '] to ['+ npath +']', err)
             except Exception as err:
@@ -422,7 +988,33 @@ def test_MSW_loadFile():
     msw.loadFile('./test/dampedPendulum/dampedPendulum.mo')
 
 
-msw = ModelicaScriptingWrapper() #one instance for all simulation methods lest we keep spinning up omc servers
+msw = ModelicaScriptingWrapper() #one instance for all simulation methods lest we keep spinning up omc servers; OMC only starts when first needed
+
+def _deliverCachedResult(cachedResult, npath): #copy a cached result to npath, returning npath or False on failure as copyFromTemp() does
+    try:
+        return deliverFile(cachedResult, npath, keepSource=True)
+    except OSError as err:
+        print('caught OSError copying cached result ['+ cachedResult+ '] to ['+ npath +']', err)
+    return False
+
+def dropResultParameters(resultFile): #remove the parameters and constants from a finished result, see ModelicaResult.removeParameters(); True on success
+    from ModelicaResult import removeParameters #matplotlib is slow to import, only load it when needed
+    try:
+        removeParameters(resultFile)
+        return True
+    except Exception as err: #a truncated or foreign file, the result is left as it was
+        print('dropResultParameters: could not remove the parameters of [' + resultFile + ']', err)
+        return False
+
+def _outputFilter(outputs, dropDerivatives, dropParameters): #the output filtering arguments for getResultCacheKey(), None when unfiltered
+    if outputs or dropDerivatives or dropParameters:
+        return [sorted(outputs), dropDerivatives, dropParameters]
+    return None
+
+def getSession(session=None): #the given ModelicaScriptingWrapper, or the module's shared one
+    if session is None:
+        return msw
+    return session
 
 fullPath = ''
 diretoryPath = ''
@@ -432,14 +1024,167 @@ retLoadLibraries=True
 retLoadModel=False
 retCheckModel=False
 simOps = {}
-def ModelicaOptimize( modelPath, modelName, libraryPaths=[], modelParameters={}, resultDir='.', reinit=True ):
-    if reinit:
-        fullPath = os.path.expanduser(modelPath)
-        directoryPath, modelFileName = os.path.split( fullPath )
+def ModelicaOptimize( modelPath, modelName, libraryPaths=[], objective=None, bounds={}, modelParameters={}, x0={}, resultDir='.', nProcesses=1, maxEvaluations=200, tolerance=1e-6, session=None, profile='throughput', outputs=[] ): # minimize objective over the bounded parameters by Nelder-Mead, running the model's executable built once
+    """Minimize objective(ModelicaResult) over the parameters in bounds with the Nelder-Mead simplex method.
+    objective function of a loaded ModelicaResult returning a number to minimize, or a dict with a 'score' entry, as ModelicaSimulateAnalyzeSweep's metric; failed runs and None score infinity
+    bounds={} eg {'cor':(0.1, 0.9), 'h':(1, 9)}; candidates are clipped into the bounds
+    modelParameters={} fixed overrides applied to every run
+    x0={} starting point, defaults to the middle of bounds
+    nProcesses=1 number of worker processes; the initial simplex and shrink steps are evaluated as one batch, and with 4 or more processes so are the reflection, expansion and both contractions
+    maxEvaluations=200, tolerance=1e-6 stop after this many runs, or once the simplex's scores differ by less than tolerance
+    profile='throughput' the profiles entry to build and run with
+    outputs=[] store only these variables in the results, see makeVariableFilter(); they must include what objective reads
+    Returns an optInfo dict of 'success', 'parameters', 'score', 'resultFile' (the best result, moved to resultDir), 'nEvaluations' and 'history' [(parameters, score)].
+    """
+    msw = getSession(session)
+    fullPath = os.path.expanduser(modelPath)
+    keys = list(bounds)
+    d = len(keys)
+    lo = np.array([bounds[k][0] for k in keys], dtype=float)
+    hi = np.array([bounds[k][1] for k in keys], dtype=float)
+    optInfo = {'success':False, 'parameters':{}, 'score':np.inf, 'resultFile':'', 'nEvaluations':0, 'history':[]}
+    if objective is None or d == 0:
+        print('ModelicaOptimize: give an objective and the bounds of at least one parameter')
+        return optInfo
+
+    buildInfo = _buildModel(msw, fullPath, modelName, libraryPaths, msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName), profile)
+    if not buildInfo['success']:
+        print("Couldn't build model")
+        return optInfo
+
+    keepDir = tempfile.mkdtemp(prefix='keep_', dir=msw.tempDir.name)
+    variableFilter = makeVariableFilter(outputs)
+    pool = None
+    if 1 < nProcesses:
+        pool = Pool(nProcesses, initializer=_sweepWorkerInit, initargs=(fullPath, modelName, libraryPaths, buildInfo, objective, profile, variableFilter, msw.tempRoot, True))
+
+    def evaluate(points): #run a batch of points in the unit cube, returning their scores and keeping only the best result file
+        pls = []
+        for u in points:
+            pl = dict(modelParameters)
+            pl.update(zip(keys, (lo + np.clip(u, 0, 1)*(hi-lo)).tolist()))
+            pls.append(pl)
+        if pool is not None:
+            simInfos = _imapBounded(pool, _analyzeWorkerSimulate, ((fullPath, modelName, pl, keepDir, optInfo['nEvaluations']+i) for i,pl in enumerate(pls)), 4*nProcesses)
+        else:
+            simInfos = (_analyzeSweepPoint(msw, fullPath, modelName, pl, keepDir, buildInfo, objective, profile, variableFilter, True, index=optInfo['nEvaluations']+i) for i,pl in enumerate(pls)) #full precision, so the simplex scores the points it asked for
+        scores = []
+        for simInfo in simInfos:
+            score = simInfo['score'] if simInfo['success'] and simInfo['score'] is not None else np.inf
+            optInfo['nEvaluations'] += 1
+            optInfo['history'].append((simInfo['paramList'], score))
+            if score < optInfo['score']:
+                if optInfo['resultFile'] and optInfo['resultFile'] != simInfo['resultFile']:
+                    os.remove(optInfo['resultFile'])
+                optInfo.update({'parameters':simInfo['paramList'], 'score':score, 'resultFile':simInfo['resultFile']})
+            elif simInfo['resultFile'] and simInfo['resultFile'] != optInfo['resultFile']:
+                os.remove(simInfo['resultFile'])
+            print(f"{optInfo['nEvaluations']:3d} {score:3.3e} best {optInfo['score']:3.3e} {simInfo.get('overrideString', '')}")
+            scores.append(score)
+        return scores
+
+    # Nelder-Mead in the unit cube of bounds, with the standard coefficients
+    start = np.array([(x0.get(k, (bounds[k][0]+bounds[k][1])/2) - lo[i])/(hi[i]-lo[i]) for i,k in enumerate(keys)])
+    simplex = [start] + [start + np.where(np.arange(d) == i, (0.1 if start[i] < 0.9 else -0.1), 0) for i in range(d)]
+    scores = evaluate(simplex)
+    while optInfo['nEvaluations'] < maxEvaluations:
+        order = np.argsort(scores)
+        simplex = [simplex[i] for i in order]
+        scores = [scores[i] for i in order]
+        if abs(scores[-1] - scores[0]) < tolerance:
+            break
+        centroid = np.mean(simplex[:-1], axis=0)
+        worst = simplex[-1]
+        xr = np.clip(centroid + (centroid - worst), 0, 1)
+        xe = np.clip(centroid + 2*(centroid - worst), 0, 1)
+        xoc = np.clip(centroid + 0.5*(centroid - worst), 0, 1)
+        xic = centroid - 0.5*(centroid - worst)
+        if pool is not None and 4 <= nProcesses: #speculatively run every candidate of this step at once
+            fr, fe, foc, fic = evaluate([xr, xe, xoc, xic])
+        else:
+            fr, = evaluate([xr])
+            fe = foc = fic = None
+
+        if fr < scores[0]:
+            if fe is None:
+                fe, = evaluate([xe])
+            simplex[-1], scores[-1] = (xe, fe) if fe < fr else (xr, fr)
+        elif fr < scores[-2]:
+            simplex[-1], scores[-1] = xr, fr
+        else:
+            if fr < scores[-1]: #outside contraction
+                if foc is None:
+                    foc, = evaluate([xoc])
+                xc, fc, fcmp = xoc, foc, fr
+            else: #inside contraction
+                if fic is None:
+                    fic, = evaluate([xic])
+                xc, fc, fcmp = xic, fic, scores[-1]
+            if fc < fcmp:
+                simplex[-1], scores[-1] = xc, fc
+            else: #shrink towards the best point, one batch
+                simplex = [simplex[0]] + [simplex[0] + 0.5*(x - simplex[0]) for x in simplex[1:]]
+                scores = [scores[0]] + evaluate(simplex[1:])
+
+    if pool is not None:
+        pool.close()
+        pool.join() #let the workers exit normally so their tempDirs are removed
+    if optInfo['resultFile']:
+        optInfo['resultFile'] = deliverFile(optInfo['resultFile'], os.path.join(resultDir, os.path.basename(optInfo['resultFile'])))
+        optInfo['success'] = True
+    shutil.rmtree(keepDir, ignore_errors=True)
+    return optInfo
+
+def ModelicaSimulate( modelPath, modelName, libraryPaths=[], modelParameters={}, resultPath='.', rebuild=False, useResultCache=True, session=None, profile='diagnostic', outputs=[], dropDerivatives=False, dropParameters=False ): # compile and simulate the given model, returning the result path
+    """Simulate the given file, producing Modelica result [.mat] and [.log] files.
+    modelPath='' relative or absolute path to the Modelica model, eg '~/test/BouncingBall/BouncingBall.mo' 
+    modelName='' name of the model when parsed by Modelica, eg 'BouncingBall' 
+    libraryPaths=[] libraries to include; the Modelica Standard Library is automatically loaded, eg ['~/lib/MMR_SpringDamper_Limited.mo', '~/lib/MMR_SpringDamper_Unlimited.mo']
+    modelParameters={} override the simulation parameters written in the experiment annotation, eg {'ra_jLoad': -5}. See also ModelicaSimulate.makeParameterStartStopN()...
+    resultPath='.' optional directory for the results, eg './test/BouncingBall/BouncingBall_res.mat'
+    rebuild=False the executable is reused from the build cache when the model, libraries, OMC version and options are unchanged; True always calls OMC simulate()
+    useResultCache=True return the cached result of an identical earlier simulation (same sources, libraries, modelParameters and options) instead of simulating
+    session=None the ModelicaScriptingWrapper to use, defaults to the module's shared one
+    profile='diagnostic' the profiles entry to build and run with, 'throughput' for minimal logging; recorded in simInfo['profile']
+    outputs=[], dropDerivatives=False, dropParameters=False store only these variables in the result, or leave out derivatives and parameters, see makeVariableFilter(); the parameters are removed from the result after the run, see dropResultParameters()
+    """
+    msw = getSession(session)
+    msw.timings = {}
+    fullPath = ''
+    diretoryPath = ''
+    modelFileName = ''
+
+    fullPath = os.path.expanduser(modelPath)
+    directoryPath, modelFileName = os.path.split( fullPath )
+
+    simOps = dict(msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName))
+    # print('simOps:')
+    # pp.pprint(simOps)
 
+    resultKey = ''
+    if useResultCache and msw.cacheDir:
+        resultKey = msw.getResultCacheKey(fullPath, modelName, libraryPaths, modelParameters, simOps, profile, _outputFilter(outputs, dropDerivatives, dropParameters))
+        cachedResult = '' if rebuild else msw.getCachedResult(resultKey) #rebuild always simulates, refreshing the cached result
+        if cachedResult:
+            npath = os.path.join(resultPath, modelName + '_res.mat')
+            print('using cached result [' + cachedResult + ']')
+            return {'success':True, 'cached':True, 'resultFile':_deliverCachedResult(cachedResult, npath), 'logFile':'', 'timings':dict(msw.timings), 'profile':profile}
+
+    if not rebuild:
+        buildInfo = _buildModel(msw, fullPath, modelName, libraryPaths, simOps, profile)
+        if not buildInfo['success']:
+            print('buildModel:', msw.getErrorString())
+            sys.exit(1)
+        simInfo = msw.runExecutable(buildInfo, modelParameters, variableFilter=makeVariableFilter(outputs, dropDerivatives))
+        if not simInfo['success']:
+            print('simInfo:')
+            pp.pprint(simInfo)
+    else:
         retLoadMSL = msw.loadModelicaStandardLibrary()
         if not retLoadMSL:
+            print('loadMSL:',msw.getErrorString())
             sys.exit(1)
+        # print('loadMSL:',msw.getErrorString())
 
         retLoadLibraries = True
         for lib in libraryPaths:
@@ -447,87 +1192,37 @@ def ModelicaOptimize( modelPath, modelName, libraryPaths=[], modelParameters={},
             retLoadLibraries &= msw.loadFile( lib )
             if not retLoadLibraries:
                 print('Library [', lib, '] does not exist, specify correct path')
+                print(msw.getErrorString())
         if not retLoadLibraries:
+            print('loadLibraries:', msw.getErrorString())
             sys.exit(1)
+        # print('loadLibraries:', msw.getErrorString())
 
         retLoadModel = msw.loadFile( fullPath )
         if not retLoadModel:
+            print('loadFile:',msw.getErrorString())
             sys.exit(1)
+        # print('loadFile:', retLoadModel, msw.getErrorString())
+
         retCheckModel = msw.checkModel(modelName)
         if not retCheckModel['success']:
-            sys.exit(1)
-
-        simOps = msw.getSimulationOptionsFromExperimentAnnotation(fullPath)
-
-    if modelParameters:
-        overstring = msw.overrideParamDict2String( modelParameters )
-        simOps.update({'simflags':'\"-override {}\"'.format(overstring)} )
-
-    simInfo = msw.simulate(modelName, simOps)
-    # if simInfo['success']:
-        # resultDestination = msw.copyFromTemp(simInfo['resultFile'])
-        # simInfo['resultFile'] = resultDestination
-    return simInfo
-
-def ModelicaSimulate( modelPath, modelName, libraryPaths=[], modelParameters={}, resultPath='.' ): # compile and simulate the given model, returning the result path
-    """Simulate the given file, producing Modelica result [.mat] and [.log] files.
-    modelPath='' relative or absolute path to the Modelica model, eg '~/test/BouncingBall/BouncingBall.mo' 
-    modelName='' name of the model when parsed by Modelica, eg 'BouncingBall' 
-    libraryPaths=[] libraries to include; the Modelica Standard Library is automatically loaded, eg ['~/lib/MMR_SpringDamper_Limited.mo', '~/lib/MMR_SpringDamper_Unlimited.mo']
-    modelParameters={} override the simulation parameters written in the experiment annotation, eg {'ra_jLoad': -5}. See also ModelicaSimulate.makeParameterStartStopN()...
-    resultPath='.' optional directory for the results, eg './test/BouncingBall/BouncingBall_res.mat'
-    """
-    fullPath = ''
-    diretoryPath = ''
-    modelFileName = ''
-
-    fullPath = os.path.expanduser(modelPath)
-    directoryPath, modelFileName = os.path.split( fullPath )
-
-    retLoadMSL = msw.loadModelicaStandardLibrary()
-    if not retLoadMSL:
-        print('loadMSL:',msw.getErrorString())
-        sys.exit(1)
-    # print('loadMSL:',msw.getErrorString())
-
-    retLoadLibraries = True
-    for lib in libraryPaths:
-        retLoadLibraries &= os.path.exists( os.path.expanduser(lib) )
-        retLoadLibraries &= msw.loadFile( lib )
-        if not retLoadLibraries:
-            print('Library [', lib, '] does not exist, specify correct path')
-            print(msw.getErrorString())
-    if not retLoadLibraries:
-        print('loadLibraries:', msw.getErrorString())
-        sys.exit(1)
-    # print('loadLibraries:', msw.getErrorString())
-
-    retLoadModel = msw.loadFile( fullPath )
-    if not retLoadModel:
-        print('loadFile:',msw.getErrorString())
-        sys.exit(1)
-    # print('loadFile:', retLoadModel, msw.getErrorString())
-
-    retCheckModel = msw.checkModel(modelName)
-    if not retCheckModel['success']:
-        print('checkModel:', msw.getErrorString())
-        # sys.exit(1)
-
-    simOps = msw.getSimulationOptionsFromExperimentAnnotation(fullPath)
-    # print('simOps:')
-    # pp.pprint(simOps)
-
-    if modelParameters:
-        overstring = msw.overrideParamDict2String( modelParameters )
-        simOps.update({'simflags':'\"-override={}\"'.format(overstring)} )
-
-    simInfo = msw.simulate(modelName, simOps)
-    if not simInfo['success']:
-        print('simInfo:')
-        pp.pprint(simInfo)
-        # print(simInfo['simulationOptions'])
-        # print(simInfo['command'])
-        print('simulate:', msw.getErrorString())
+            print('checkModel:', msw.getErrorString())
+            # sys.exit(1)
+
+        if modelParameters:
+            overstring = msw.overrideParamDict2String( modelParameters )
+            simOps.update({'simflags':'\"-override={}\"'.format(overstring)} )
+
+        variableFilter = makeVariableFilter(outputs, dropDerivatives)
+        if variableFilter:
+            simOps['variableFilter'] = modelicaString(variableFilter)
+        simInfo = msw.simulate(modelName, simOps, profile)
+        if not simInfo['success']:
+            print('simInfo:')
+            pp.pprint(simInfo)
+            # print(simInfo['simulationOptions'])
+            # print(simInfo['command'])
+            print('simulate:', msw.getErrorString())
 
     mname = modelName + '.log'
     simInfo['logFile'] = msw.copyFromTemp( mname, newName=mname, newPath=resultPath )
@@ -539,13 +1234,93 @@ def ModelicaSimulate( modelPath, modelName, libraryPaths=[], modelParameters={},
         simInfo['success'] = False
 
     if simInfo['success'] and simInfo['resultFile']:
+        if dropParameters and not outputs:
+            dropResultParameters( os.path.join(msw.tempDir.name, simInfo['resultFile']) )
         mname = modelName + '.log'
         resultDestination = msw.copyFromTemp( simInfo['resultFile'], newName=os.path.basename(simInfo['resultFile']), newPath=resultPath )
         pp.pprint(resultDestination)
         simInfo['resultFile'] = resultDestination
+        if resultKey and resultDestination:
+            msw.storeResult(resultKey, resultDestination)
+    simInfo['timings'] = dict(msw.timings)
+    return simInfo
+
+asyncConcurrency = int(os.environ.get('MODELICASIMULATE_CONCURRENCY', os.cpu_count() or 1)) #number of ModelicaSimulateAsync() runs executing at once per event loop
+_asyncSemaphores = weakref.WeakKeyDictionary() # event loop : semaphore bounding its runs to asyncConcurrency, dropped with the loop
+_asyncBuildLocks = weakref.WeakKeyDictionary() # event loop : lock so concurrent calls build a model only once
+
+async def ModelicaSimulateAsync( modelPath, modelName, libraryPaths=[], modelParameters={}, resultPath='.', useResultCache=True, timeout=None, session=None, profile='diagnostic', outputs=[], dropDerivatives=False, dropParameters=False ): # await a simulation without blocking the event loop, returning its simInfo
+    """Awaitable ModelicaSimulate(): the model is built through the build cache on a thread, then its executable is run as an asyncio subprocess.
+    At most asyncConcurrency runs execute at once, the rest wait their turn; OMC calls are serialized per session, see executeAsync().
+    timeout=None seconds a run may take before it is killed and returned with success False
+    Cancelling the awaiting task kills its run. The other arguments are as ModelicaSimulate(), except that modelParameters are passed at full precision.
+    Results are named <modelName>_res_<overstring>_<id>.mat, id being unique to the call, so concurrent runs do not overwrite each other even with the same parameters.
+    """
+    msw = getSession(session)
+    fullPath = os.path.expanduser(modelPath)
+    loop = asyncio.get_running_loop()
+    if loop not in _asyncSemaphores:
+        _asyncSemaphores[loop] = asyncio.Semaphore(asyncConcurrency)
+        _asyncBuildLocks[loop] = asyncio.Lock()
+
+    if msw.useOMCSimulationOptions: #OMC calls go through the session's lock
+        simOps = await msw.executeAsync(msw.getSimulationOptionsFromExperimentAnnotation, fullPath, modelName)
+    else: #reads and hashes the file
+        simOps = await loop.run_in_executor(None, msw.getSimulationOptionsFromExperimentAnnotation, fullPath, modelName)
+    overstring = msw.overrideParamDict2String( modelParameters, True ).replace(' ', '')
+    rname = modelName + ('_res_' + overstring if overstring else '_res') + '_' + uuid.uuid4().hex[:8] + '.mat'
+
+    resultKey = ''
+    if useResultCache and msw.cacheDir:
+        #hashes the sources, and may ask OMC its version
+        resultKey = await msw.executeAsync(msw.getResultCacheKey, fullPath, modelName, libraryPaths, modelParameters, simOps, profile, _outputFilter(outputs, dropDerivatives, dropParameters), True)
+        cachedResult = await loop.run_in_executor(None, msw.getCachedResult, resultKey)
+        if cachedResult:
+            print('using cached result [' + cachedResult + ']')
+            resultFile = await loop.run_in_executor(None, _deliverCachedResult, cachedResult, os.path.join(resultPath, rname))
+            return {'success':True, 'cached':True, 'resultFile':resultFile, 'logFile':'', 'profile':profile}
+
+    async with _asyncBuildLocks[loop]: #later calls find the first call's build in the cache
+        buildInfo = await msw.executeAsync(_buildModel, msw, fullPath, modelName, libraryPaths, simOps, profile)
+    if not buildInfo['success']:
+        print('buildModel failed for [' + modelName + ']')
+        return {'success':False, 'resultFile':'', 'logFile':''}
+
+    async with _asyncSemaphores[loop]:
+        simInfo = await msw.runExecutableAsync(buildInfo, modelParameters, timeout=timeout,
+                                               variableFilter=makeVariableFilter(outputs, dropDerivatives), precise=True)
+    simInfo['paramList'] = modelParameters
+
+    def deliver(): #move the log and result out of the run's directory, which may copy across filesystems
+        runDir = simInfo['outputDir']
+        logFile = os.path.join(runDir, modelName + '.log')
+        simInfo['logFile'] = ''
+        if os.path.exists(logFile):
+            simInfo['logFile'] = deliverFile(logFile, os.path.join(resultPath, rname.replace('.mat', '.log')))
+        if simInfo['success']:
+            if dropParameters and not outputs:
+                dropResultParameters(simInfo['resultFile'])
+            simInfo['resultFile'] = deliverFile(simInfo['resultFile'], os.path.join(resultPath, rname))
+            if resultKey:
+                msw.storeResult(resultKey, simInfo['resultFile'])
+        else:
+            print('simInfo:')
+            pp.pprint(simInfo)
+        shutil.rmtree(runDir, ignore_errors=True)
+    await loop.run_in_executor(None, deliver)
     return simInfo
 
-def ModelicaSimulateSweep( modelPath, modelName, libraryPaths, sweepParameters, resultDir='.'): # compile and simulate the given model, returning the result path; rebuilds the model for _every_ parameter since <override> fails
+def ModelicaSimulateSweep( modelPath, modelName, libraryPaths, sweepParameters, resultDir='.', nProcesses=1, rebuild=False, session=None, manifestPath='', resume=True, profile='diagnostic', outputs=[], dropDerivatives=False, dropParameters=False): # compile the given model once and simulate it at every parameter combination, returning the result paths
+    """Simulate the model at every combination of sweepParameters, see iterateParamList(), or at every parameter dict of an iterable such as sampleParamList().
+    nProcesses=1 number of worker processes, each with its own tempDir; the returned sweepInfo is in the order of the points
+    rebuild=False the model is built once and its executable run with -override for each point; True calls OMC simulate() for every point, recompiling each time
+    session=None the ModelicaScriptingWrapper to use, defaults to the module's shared one
+    manifestPath='' JSON Lines file to which each finished point is appended, defaults to resultDir/<modelName>_sweep.jsonl; None disables it
+    resume=True skip points the manifest records as successful whose result file still exists, returning their manifest entries instead; only entries with the same parameters, sources, libraries, OMC version, profile and outputs are reused
+    profile='diagnostic' the profiles entry to build and run every point with, 'throughput' for minimal logging
+    outputs=[], dropDerivatives=False, dropParameters=False store only these variables in the results, or leave out derivatives and parameters, see makeVariableFilter(); the parameters are removed from the result after the run, see dropResultParameters()
+    """
+    msw = getSession(session)
     fullPath = ''
     diretoryPath = ''
     modelFileName = ''
@@ -553,178 +1328,402 @@ def ModelicaSimulateSweep( modelPath, modelName, libraryPaths, sweepParameters,
     fullPath = os.path.expanduser(modelPath)
     directoryPath, modelFileName = os.path.split( fullPath )
 
-    retLoadMSL = msw.loadModelicaStandardLibrary()
-    if not retLoadMSL:
-        print('retLoadMSL')
-        sys.exit(1)
+    sweepInfo = []
+    flatParamList = _sweepPoints(sweepParameters)
+    nf = countSweepPoints(sweepParameters)
+
+    buildInfo = None
+    if not rebuild:
+        buildInfo = _buildModel(msw, fullPath, modelName, libraryPaths, msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName), profile)
+        if not buildInfo['success']:
+            print('buildModel failed')
+            sys.exit(1)
+    elif nProcesses <= 1: #workers load the model themselves when rebuilding in parallel
+        retLoadMSL = msw.loadModelicaStandardLibrary()
+        if not retLoadMSL:
+            print('retLoadMSL')
+            sys.exit(1)
 
-    retLoadLibraries = True
-    for lib in libraryPaths:
-        retLoadLibraries &= os.path.exists( os.path.expanduser(lib) )
-        retLoadLibraries &= msw.loadFile( lib )
+        retLoadLibraries = True
+        for lib in libraryPaths:
+            retLoadLibraries &= os.path.exists( os.path.expanduser(lib) )
+            retLoadLibraries &= msw.loadFile( lib )
+            if not retLoadLibraries:
+                print('Library [', lib, '] does not exist, specify correct path')
         if not retLoadLibraries:
-            print('Library [', lib, '] does not exist, specify correct path')
-    if not retLoadLibraries:
-        print('retLoadLibraries')
-        sys.exit(1)
-
-    retLoadModel = msw.loadFile( fullPath )
-    if not retLoadModel:
-        print('retLoadModel')
-        sys.exit(1)
-    retCheckModel = msw.checkModel(modelName)
-    if not retCheckModel['success']:
-        print('retCheckModel')
-        mname = modelName + '.log'
-        msw.copyFromTemp( os.path.join(resultDir,mname), mname )
-        sys.exit(1)
+            print('retLoadLibraries')
+            sys.exit(1)
+
+        retLoadModel = msw.loadFile( fullPath )
+        if not retLoadModel:
+            print('retLoadModel')
+            sys.exit(1)
+        retCheckModel = msw.checkModel(modelName)
+        if not retCheckModel['success']:
+            print('retCheckModel')
+            mname = modelName + '.log'
+            msw.copyFromTemp( os.path.join(resultDir,mname), mname )
+            sys.exit(1)
+
+    variableFilter = makeVariableFilter(outputs, dropDerivatives)
+    dropParameters = dropParameters and not outputs #outputs already leave out what they do not name
+    manifest = None
+    completed = {}
+    sweepKey = ''
+    if manifestPath is not None:
+        manifestPath = manifestPath or os.path.join(resultDir, modelName + '_sweep.jsonl')
+        sweepKey = msw.getResultCacheKey(fullPath, modelName, libraryPaths, {}, msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName), profile, _outputFilter(outputs, dropDerivatives, dropParameters))
+        if resume:
+            completed = readSweepManifest(manifestPath, sweepKey)
+        manifest = open(manifestPath, 'a+')
+        if manifest.tell() > 0:
+            manifest.seek(manifest.tell() - 1)
+            if manifest.read(1) != '\n': #end a line cut short by a killed sweep, so the next entry starts cleanly
+                manifest.write('\n')
+    def skip(point): #the manifest entry of an already completed point, or None
+        entry = completed.get(_manifestPointKey( point[2] ))
+        if entry:
+            return dict(entry, success=True, resumed=True)
+        return None
 
-    sweepInfo = []
-    flatParamList = msw.elaborateParamList(sweepParameters)
-    nf = len(flatParamList)
     cnt = 0
     tstart = datetime.datetime.now()
-    for pl in flatParamList:
-        simOps = msw.getSimulationOptionsFromExperimentAnnotation(fullPath)
+    points = ((fullPath, modelName, pl, resultDir) for pl in flatParamList)
+    if 1 < nProcesses:
+        pool = Pool(nProcesses, initializer=_sweepWorkerInit, initargs=(fullPath, modelName, libraryPaths, buildInfo, None, profile, variableFilter, msw.tempRoot, False, dropParameters))
+        simInfos = _imapBounded(pool, _sweepWorkerSimulate, points, 4*nProcesses, skip) #in the order of points
+    else:
+        pool = None
+        simInfos = (skip(point) or _simulateSweepPoint(msw, fullPath, modelName, point[2], resultDir, buildInfo, profile, variableFilter, dropParameters) for point in points)
 
-        # cd['simflags'] = '\"-override R=1.35,Lw=6e-3\"'
-        overstring = msw.overrideParamDict2String( pl )
+    for simInfo in simInfos:
+        cnt += 1
+        _printSweepStatus(simInfo, cnt, nf, tstart)
+        if manifest and not simInfo.get('resumed'):
+            _appendSweepManifest(manifest, simInfo, sweepKey)
+        sweepInfo.append(simInfo)
+    if pool is not None:
+        pool.close()
+        pool.join() #let the workers exit normally so their tempDirs are removed
+    if manifest:
+        manifest.close()
+    return sweepInfo
+
+def readSweepManifest(manifestPath, sweepKey=None): #the entries of a sweep manifest that succeeded and whose result file still exists, by _manifestPointKey() of their paramList
+    # sweepKey=None only return entries recorded under this key, see ModelicaSimulateSweep(); None returns all of them
+    completed = {}
+    if not os.path.exists(manifestPath):
+        return completed
+    with open(manifestPath, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError: #the last line of a sweep that was killed mid-write
+                continue
+            if sweepKey is not None and entry.get('sweepKey') != sweepKey: #another model version, profile or outputs
+                continue
+            key = _manifestPointKey(entry.get('paramList', {}))
+            if entry.get('status') == 'success' and os.path.exists(entry.get('resultFile', '')):
+                completed[key] = entry
+            else: #a later failure supersedes an earlier success
+                completed.pop(key, None)
+    print('manifest [' + manifestPath + '] has ' + str(len(completed)) + ' completed points')
+    return completed
+
+def _manifestPointKey(paramList): #the parameters at full precision, unlike the rounded overrideString
+    return json.dumps(paramList, sort_keys=True, default=_jsonValue)
+
+def _appendSweepManifest(f, simInfo, sweepKey=''): #durably append one finished point to an open manifest
+    # sweepKey='' the result cache key of the sweep without parameters, so resuming can tell changed models and settings apart
+    entry = {'paramList':simInfo.get('paramList', {}),
+             'sweepKey':sweepKey,
+             'overrideString':simInfo.get('overrideString', ''),
+             'status':'success' if simInfo['success'] else 'failed',
+             'profile':simInfo.get('profile', ''),
+             'resultFile':os.path.abspath(simInfo['resultFile']) if simInfo['success'] and simInfo['resultFile'] else '',
+             'timings':simInfo.get('timings', {}),
+             'metrics':simInfo.get('metrics', {}),
+             'solverStatistics':simInfo.get('solverStatistics'),
+             'finished':datetime.datetime.now().isoformat()}
+    f.write(json.dumps(entry, default=_jsonValue) + '\n')
+    f.flush()
+    os.fsync(f.fileno()) #survive the machine going away, not just the process
+
+def _jsonValue(o): #json.dumps default for numpy scalars, SolverStatistics and anything else a paramList holds
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, 'item'):
+        return o.item()
+    return str(o)
+
+def _simulateSweepPoint(msw, fullPath, modelName, pl, resultDir, buildInfo=None, profile='diagnostic', variableFilter='', dropParameters=False): #simulate one parameter combination on the given wrapper, copying the result into resultDir
+    tstart = time.perf_counter()
+    msw.timings = {}
+    simInfo = _runSweepPoint(msw, fullPath, modelName, pl, buildInfo, profile, variableFilter, dropParameters=dropParameters)
+    # mname = modelName + '.log'
+    # simInfo['logFile'] = msw.copyFromTemp( mname, mname.replace('.log', '_'+overstring+'.log') )
+
+    if simInfo['success']:
+        rpath = os.path.join( resultDir, os.path.basename( simInfo['resultFile'] ).replace('.mat', '_'+simInfo['overrideString']+'.mat'))
+        simInfo['resultFile'] = msw.copyFromTemp(simInfo['resultFile'], rpath)
+    simInfo['timings'] = dict(msw.timings, point=time.perf_counter() - tstart)
+    return simInfo
 
+def _runSweepPoint(msw, fullPath, modelName, pl, buildInfo=None, profile='diagnostic', variableFilter='', precise=False, dropParameters=False): #simulate one parameter combination, leaving the result in msw's tempDir
+    overstring = msw.overrideParamDict2String( pl, precise )
+
+    if buildInfo:
+        simInfo = msw.runExecutable(buildInfo, pl, variableFilter=variableFilter, precise=precise)
+    else:
+        simOps = dict(msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName))
+
+        # cd['simflags'] = '\"-override R=1.35,Lw=6e-3\"'
         simOps.update({'simflags':'\"-override {}\"'.format(overstring)} )
+        if variableFilter:
+            simOps['variableFilter'] = modelicaString(variableFilter)
         # print('MSS.simOps:')
         # pp.pprint(simOps)
 
-        simInfo = msw.simulate(modelName, simOps)
-        simInfo.update({'paramList':pl})
-        # print('MSS.simInfo:')
-        # pp.pprint(simInfo)
-        # print('MSS.simInfo.command: ', simInfo['command'])
+        simInfo = msw.simulate(modelName, simOps, profile)
+    simInfo.update({'paramList':pl})
+    if dropParameters and simInfo['success'] and simInfo['resultFile']:
+        dropResultParameters( os.path.join(msw.tempDir.name, simInfo['resultFile']) )
+    # print('MSS.simInfo:')
+    # pp.pprint(simInfo)
+    # print('MSS.simInfo.command: ', simInfo['command'])
 
-        overstring = overstring.replace(' ', '')
-        simInfo['overrideString'] = overstring
-        # mname = modelName + '.log'
-        # simInfo['logFile'] = msw.copyFromTemp( mname, mname.replace('.log', '_'+overstring+'.log') )
+    simInfo['overrideString'] = overstring.replace(' ', '')
+    return simInfo
 
-        cnt += 1
-        telap = (datetime.datetime.now() - tstart).total_seconds()
+def _printSweepStatus(simInfo, cnt, nf, tstart):
+    telap = (datetime.datetime.now() - tstart).total_seconds()
+    if nf is None: #streamed points of unknown number
+        status = f"{cnt:3d} elapsed[{telap/60:3.1f}]m"
+    else:
         remain = telap/cnt*(nf-cnt)/60
         status = f"{cnt:3d}:{nf:3d} remain[{remain:3.1f}]m"
-        if simInfo['success']:
-            rpath = os.path.join( resultDir, os.path.basename( simInfo['resultFile'] ).replace('.mat', '_'+overstring+'.mat'))
-            simInfo['resultFile'] = msw.copyFromTemp(simInfo['resultFile'], rpath)
-            print(status+' result path:', simInfo['resultFile'])
-        else:
-            print(status+'simInfo sayz not succssful, cant copy results')
-            pp.pprint(simInfo)
-
-        sweepInfo.append(simInfo)
-    return sweepInfo
+    if simInfo['success']:
+        print(status+' result path:', simInfo['resultFile'])
+    else:
+        print(status+'simInfo sayz not succssful, cant copy results')
+        pp.pprint(simInfo)
 
-def ModelicaSimulateAnalyzeSweep( modelPath, modelName, libraryPaths, sweepParameters, nKeep=100, resultDir='.'): # compile and simulate the given model, returning the result path; rebuilds the model for _every_ parameter since <override> fails
-    fullPath = ''
-    diretoryPath = ''
-    modelFileName = ''
+def _sweepPoints(sweepParameters): #iterate over the parameter dicts of a sweep given as specs (see iterateParamList) or as an iterable of dicts
+    if isinstance(sweepParameters, dict):
+        return iterateParamList(sweepParameters)
+    return iter(sweepParameters)
+
+def _imapBounded(pool, func, iterable, nAhead, skip=None): #like pool.imap, but only takes nAhead items from iterable ahead of the results, so long generators are not materialized
+    # skip=None function of an item returning its result without running func, or None to run it
+    pending = collections.deque()
+    for item in iterable:
+        done = skip(item) if skip else None
+        if done is not None:
+            pending.append(lambda done=done: done)
+        else:
+            pending.append(pool.apply_async(func, (item,)).get)
+        if nAhead <= len(pending):
+            yield pending.popleft()()
+    while pending:
+        yield pending.popleft()()
+
+_workerSession = None # the ModelicaScriptingWrapper of a sweep worker process
+_workerLoaded = False
+_workerBuildInfo = None
+_workerMetric = None
+_workerProfile = 'diagnostic'
+_workerVariableFilter = ''
+_workerPrecise = False
+_workerDropParameters = False
+def _sweepWorkerInit(fullPath, modelName, libraryPaths, buildInfo=None, metric=None, profile='diagnostic', variableFilter='', tempRoot=None, precise=False, dropParameters=False): #Pool initializer: give this worker process its own OMC session and tempDir, and load the model once unless given an already-built executable
+    global _workerSession, _workerLoaded, _workerBuildInfo, _workerMetric, _workerProfile, _workerVariableFilter, _workerPrecise, _workerDropParameters
+    _workerSession = ModelicaScriptingWrapper(tempRoot) #beside the parent's tempDir, so kept results are renamed rather than copied
+    Finalize(_workerSession, _workerSession.close, exitpriority=10) #quit this worker's OMC and remove its tempDir, as weakref finalizers do not run when a worker exits
+
+    _workerBuildInfo = buildInfo
+    _workerMetric = metric
+    _workerProfile = profile
+    _workerVariableFilter = variableFilter
+    _workerPrecise = precise
+    _workerDropParameters = dropParameters
+    if buildInfo:
+        _workerLoaded = True
+        return
+    _workerLoaded = _loadModel(_workerSession, fullPath, modelName, libraryPaths)
+    if not _workerLoaded: #do not sys.exit() here, Pool would just restart the worker
+        print('_sweepWorkerInit: failed to load [' + fullPath + '], this worker will not simulate')
+
+def _sweepWorkerSimulate(point): #Pool task: simulate one (fullPath, modelName, paramList, resultDir) point on this worker's session
+    fullPath, modelName, pl, resultDir = point
+    if not _workerLoaded:
+        return {'success':False, 'paramList':pl, 'resultFile':''}
+    return _simulateSweepPoint(_workerSession, fullPath, modelName, pl, resultDir, _workerBuildInfo, _workerProfile, _workerVariableFilter, _workerDropParameters)
+
+def _analyzeWorkerSimulate(point): #Pool task: simulate and score one (fullPath, modelName, paramList, keepDir, index) point on this worker's session
+    fullPath, modelName, pl, keepDir, index = point
+    if not _workerLoaded:
+        return {'success':False, 'paramList':pl, 'resultFile':'', 'score':None}
+    return _analyzeSweepPoint(_workerSession, fullPath, modelName, pl, keepDir, _workerBuildInfo, _workerMetric, _workerProfile, _workerVariableFilter, _workerPrecise, _workerDropParameters, index)
+
+def _analyzeSweepPoint(msw, fullPath, modelName, pl, keepDir, buildInfo, metric, profile='diagnostic', variableFilter='', precise=False, dropParameters=False, index=0): #simulate one point, score its result with metric and move scored results into keepDir
+    # index=0 the point's position in the sweep, naming its kept result apart from points whose overrideStrings round alike
+    from ModelicaResult import ModelicaResult #matplotlib is slow to import, only load it when analyzing
+    msw.timings = {}
+    simInfo = _runSweepPoint(msw, fullPath, modelName, pl, buildInfo, profile, variableFilter, precise, dropParameters)
+    simInfo['score'] = None
+    simInfo['timings'] = msw.timings
+    if not simInfo['success']:
+        return simInfo
 
-    # msw = ModelicaScriptingWrapper()
+    resultFile = os.path.join(msw.tempDir.name, simInfo['resultFile'])
+    simInfo['resultFile'] = ''
     mre = ModelicaResult()
+    if mre.loadResult( resultFile ):
+        tstart = time.perf_counter()
+        try:
+            score = metric(mre)
+        except Exception as err: #a metric that cannot handle this result should not stop the sweep
+            print('metric failed on [' + simInfo['overrideString'] + ']', err)
+            score = None
+        _reportTiming(msw.timings, 'metric', time.perf_counter() - tstart, simInfo['overrideString'])
+        mre.dat = [] #release the mapped file before moving it
+        if isinstance(score, dict):
+            simInfo.update(score)
+            score = score.get('score')
+        if score is not None and not np.isfinite(score): #NaN compares false both ways and would break the heap order
+            print('metric gave [' + str(score) + '] on [' + simInfo['overrideString'] + '], rejecting it')
+            score = None
+        simInfo['score'] = score
+        if score is not None: #rename within the scratch filesystem; only retained results are moved out at the end
+            rpath = os.path.join(keepDir, os.path.basename(resultFile).replace('.mat', '_{}_{}.mat'.format(simInfo['overrideString'], index)))
+            deliverFile(resultFile, rpath)
+            simInfo['resultFile'] = rpath
+    return simInfo
 
-    fullPath = os.path.expanduser(modelPath)
-    directoryPath, modelFileName = os.path.split( fullPath )
-
-    retLoadMSL = msw.loadModelicaStandardLibrary()
-    if not retLoadMSL:
-        print("Couldn't load MSL")
-        sys.exit(1)
+def sumDiffABMetric(mre): #the original AnalyzeSweep metric: the summed |diffVa|+|diffVb|, lower is better, and the summed kysan/ain angle ratio
+    a = mre.getData('diffVa')
+    b = mre.getData('diffVb')
+    if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)):
+        return None
+    sab = np.sum(abs(a)) + np.sum(abs(b))
+    aab = np.sum(np.abs( np.angle(mre.getData('kysan.vA')+mre.getData('kysan.vB')*1j) / np.angle(mre.getData('ain0200.y[1]')+mre.getData('ain1200.y[1]')*1j) ))
+    return {'score':sab, 'sumDiffAB':sab, 'sumAngleAB':aab}
+
+def _buildModel(msw, fullPath, modelName, libraryPaths, simOps, profile='diagnostic'): #return the cached build of the model, or load, check and build it into the cache
+    cacheKey = ''
+    if msw.cacheDir:
+        cacheKey = msw.getBuildCacheKey(fullPath, modelName, libraryPaths, simOps, profile)
+        buildInfo = msw.getCachedBuild(cacheKey)
+        if buildInfo:
+            print('using cached build [' + buildInfo['modelExecutablePath'] + ']')
+            return buildInfo
+
+    if not _loadModel(msw, fullPath, modelName, libraryPaths):
+        return {'success':False}
+    return msw.buildModel(modelName, simOps, cacheKey=cacheKey, profile=profile)
+
+def _loadModel(msw, fullPath, modelName, libraryPaths): #load the MSL, libraryPaths and model on msw then check the model, True on success
+    if not msw.loadModelicaStandardLibrary():
+        print('loadMSL:', msw.getErrorString())
+        return False
 
-    retLoadLibraries = True
     for lib in libraryPaths:
-        retLoadLibraries &= os.path.exists( os.path.expanduser(lib) )
-        retLoadLibraries &= msw.loadFile( lib )
-        if not retLoadLibraries:
+        if not (os.path.exists( os.path.expanduser(lib) ) and msw.loadFile( lib )):
             print('Library [', lib, '] does not exist, specify correct path')
-    if not retLoadLibraries:
-        sys.exit(1)
+            print('loadLibraries:', msw.getErrorString())
+            return False
+
+    if not msw.loadFile( fullPath ):
+        print('loadFile:', msw.getErrorString())
+        return False
 
-    retLoadModel = msw.loadFile( fullPath )
-    if not retLoadModel:
-        print("Couldn't load model")
-        sys.exit(1)
     retCheckModel = msw.checkModel(modelName)
     if not retCheckModel['success']:
-        print("Couldn't check model")
-        sys.exit(1)
-
-    sweepInfo = []
-    flatParamList = msw.elaborateParamList(sweepParameters)
-    nf = len(flatParamList)
-    if nKeep < 0:
-        nKeep = nf
-    cnt = 0
-    best = []
-
-
-    for pl in flatParamList:
-    # pool = multiprocessing.Pool(4)
-        simOps = msw.getSimulationOptionsFromExperimentAnnotation(fullPath)
-
-        overstring = msw.overrideParamDict2String( pl )
-        simOps.update({'simflags':'\"-override {}\"'.format(overstring)} )
-        # print('MSS.simOps:')
-        # pp.pprint(simOps)
-
-        simInfo = msw.simulate(modelName, simOps)
-        # print('MSS.simInfo:')
-        # pp.pprint(simInfo)
-        # print('MSS.simInfo.command: ', simInfo['command'])
+        print('checkModel:', msw.getErrorString())
+        return False
+    return True
+
+def ModelicaSimulateAnalyzeSweep( modelPath, modelName, libraryPaths, sweepParameters, nKeep=100, resultDir='.', rebuild=False, session=None, metric=sumDiffABMetric, nProcesses=1, profile='diagnostic', outputs=[], dropDerivatives=False, dropParameters=False): # compile the given model once and simulate it at every parameter combination, keeping the nKeep best results; rebuild=True recompiles for every point
+    """Simulate every combination of sweepParameters, score each result with metric and keep the nKeep lowest scoring results in resultDir.
+    metric=sumDiffABMetric function of a loaded ModelicaResult returning a score, lower is better, or a dict whose 'score' entry is the score and whose other entries are added to simInfo; None rejects the result
+    nKeep=100 number of results to retain, or all if negative
+    nProcesses=1 number of worker processes; each scores its own results so only scores come back to this process, metric must be a module-level function
+    profile='diagnostic' the profiles entry to build and run every point with, 'throughput' for minimal logging
+    outputs=[], dropDerivatives=False, dropParameters=False store only these variables in the results, see makeVariableFilter(); outputs must include what metric reads
+    Results wait in a scratch directory beside the sweep's tempDir until they fall out of the nKeep best, so disk use is bounded by nKeep.
+    Retained results are named <modelName>_res_<overrideString>_<index>.mat, index being the point's position in the sweep, as points may round to the same overrideString.
+    Returns the simInfo of the retained results, best first.
+    """
+    msw = getSession(session)
+    fullPath = ''
+    diretoryPath = ''
+    modelFileName = ''
 
-        overstring = overstring.replace(' ', '')
-        simInfo['overrideString'] = overstring
-        mname = modelName + '.log'
+    fullPath = os.path.expanduser(modelPath)
+    directoryPath, modelFileName = os.path.split( fullPath )
 
-        status = '{:3d}:{:3d}'.format(cnt,nf)
+    buildInfo = None
+    if not rebuild:
+        buildInfo = _buildModel(msw, fullPath, modelName, libraryPaths, msw.getSimulationOptionsFromExperimentAnnotation(fullPath, modelName), profile)
+        if not buildInfo['success']:
+            print("Couldn't build model")
+            sys.exit(1)
+    elif nProcesses <= 1: #workers load the model themselves when rebuilding in parallel
+        if not _loadModel(msw, fullPath, modelName, libraryPaths):
+            print("Couldn't load model")
+            sys.exit(1)
 
-        if simInfo['success']:
-            ret = mre.loadResult( simInfo['resultFile'] )
-            rname = os.path.basename( simInfo['resultFile'] ).replace('.mat', '_'+overstring+'.mat')
-
-            if ret:
-                a = mre.getData('diffVa')
-                b = mre.getData('diffVb')
-
-                agood = isinstance(a, np.ndarray)
-                bgood = isinstance(b, np.ndarray)
-                if agood and bgood:
-                    sab = np.sum(abs(a)) + np.sum(abs(b))
-                    aab = np.sum(np.abs( np.angle(mre.getData('kysan.vA')+mre.getData('kysan.vB')*1j) / np.angle(mre.getData('ain0200.y[1]')+mre.getData('ain1200.y[1]')*1j) ))
-
-                    simInfo['sumDiffAB'] = sab
-                    simInfo['sumAngleAB'] = aab
-                    simInfo['resultFile'] = msw.copyFromTemp(simInfo['resultFile'], os.path.join(resultDir,rname))
-
-                    if len(best) < nKeep+1:
-                        best.append(sab)
-                        simInfo['sumDiffAB'] = sab
-                        simInfo['sumAngleAB'] = aab
-                        simInfo['resultFile'] = msw.copyFromTemp(simInfo['resultFile'], os.path.join(resultDir,rname))
-                    elif sab < best[nKeep]:
-                        best.append(sab)
-                        best.sort()
-                        simInfo['sumDiffAB'] = sab
-                        simInfo['sumAngleAB'] = aab
-                        simInfo['resultFile'] = msw.copyFromTemp(simInfo['resultFile'], os.path.join(resultDir,rname))
-
-                    print(f'{status} {sab:3.3f} {simInfo["resultFile"]}')
-        else:
+    flatParamList = _sweepPoints(sweepParameters)
+    nf = countSweepPoints(sweepParameters)
+    if nKeep < 0:
+        nKeep = sys.maxsize
+    cnt = 0
+    best = [] # heap of (-score, cnt, simInfo) holding the nKeep lowest scores, worst on top
+    keepDir = tempfile.mkdtemp(prefix='keep_', dir=msw.tempDir.name)
+    variableFilter = makeVariableFilter(outputs, dropDerivatives)
+    dropParameters = dropParameters and not outputs #outputs already leave out what they do not name
+
+    if 1 < nProcesses:
+        pool = Pool(nProcesses, initializer=_sweepWorkerInit, initargs=(fullPath, modelName, libraryPaths, buildInfo, metric, profile, variableFilter, msw.tempRoot, False, dropParameters))
+        points = ((fullPath, modelName, pl, keepDir, i) for i,pl in enumerate(flatParamList))
+        simInfos = _imapBounded(pool, _analyzeWorkerSimulate, points, 4*nProcesses)
+    else:
+        pool = None
+        simInfos = (_analyzeSweepPoint(msw, fullPath, modelName, pl, keepDir, buildInfo, metric, profile, variableFilter, False, dropParameters, i) for i,pl in enumerate(flatParamList))
+
+    for simInfo in simInfos:
+        status = '{:3d}:{}'.format(cnt,'?' if nf is None else '{:3d}'.format(nf))
+        score = simInfo['score']
+        if simInfo['success'] and score is not None:
+            if len(best) < nKeep:
+                heapq.heappush(best, (-score, cnt, simInfo))
+            elif best and score < -best[0][0]:
+                (s, c, worst) = heapq.heapreplace(best, (-score, cnt, simInfo))
+                os.remove(worst['resultFile'])
+            else:
+                os.remove(simInfo['resultFile'])
+            print(f'{status} {score:3.3f} {simInfo["overrideString"]}')
+        elif not simInfo['success']:
             print(status+'simInfo sayz not succssful, cant copy results')
             pp.pprint(simInfo)
-            simInfo['logFile'] = msw.copyFromTemp( mname, os.path.join(resultDir, mname.replace('.log', '_'+overstring+'.log')) )
-
-        sweepInfo.append(simInfo)
+            if pool is None:
+                mname = modelName + '.log'
+                simInfo['logFile'] = msw.copyFromTemp( mname, os.path.join(resultDir, mname.replace('.log', '_'+simInfo['overrideString']+'.log')) )
 
         cnt +=1
         if cnt%100 == 0:
             gc.collect()
 
+    if pool is not None:
+        pool.close()
+        pool.join() #let the workers exit normally so their tempDirs are removed
+
+    sweepInfo = []
+    for (s, c, simInfo) in sorted(best, key=lambda b: (-b[0], b[1])):
+        rpath = os.path.join(resultDir, os.path.basename(simInfo['resultFile']))
+        simInfo['resultFile'] = deliverFile(simInfo['resultFile'], rpath)
+        sweepInfo.append(simInfo)
+    shutil.rmtree(keepDir, ignore_errors=True)
     return sweepInfo
 
 def makeParameterStartStopInc(paramName, startValue, stopValue, increment):
@@ -736,12 +1735,114 @@ def makeParameterStartStopN(paramName, startValue, stopValue, N):
 def makeParameterStartStopLogN(paramName, startValue, stopValue, N):
     return { paramName:{'start':startValue,'stop':stopValue,'logN':N } }
 
+def getParameterRange(spec): #the values of one makeParameterStartStop*() spec
+    if spec.get('increment'):
+        rng = np.arange(spec['start'], spec['stop'], spec['increment'] )
+    elif spec.get('n'):
+        rng = np.linspace(spec['start'], spec['stop'], spec['n'] )
+    elif spec.get('logN') == 1:
+        rng = np.array([spec['start']])
+    elif spec.get('logN'):
+        rng = np.logspace(spec['start'], spec['stop'], spec['logN'] )
+    else:
+        rng = np.array([])
+    if rng.size == 0:
+        print(f"failed to make range for [{spec}], using its start")
+        rng = np.array([spec['start']])
+    return rng
+
+def countSweepPoints(sweepParameters): #the number of points in a sweep, or None for an iterable of unknown length
+    if isinstance(sweepParameters, dict):
+        n = 1 if sweepParameters else 0 #as iterateParamList(), no specs give no points
+        for key in sweepParameters:
+            n *= getParameterRange(sweepParameters[key]).size
+        return n
+    try:
+        return len(sweepParameters)
+    except TypeError:
+        return None
+
+def iterateParamList(paramDict): #lazily yield every combination of the makeParameterStartStop*() specs in paramDict, in the order of elaborateParamList()
+    keys = list(paramDict)
+    if not keys: #an empty sweep has no points, rather than the one empty point of itertools.product()
+        return
+    ranges = [getParameterRange(paramDict[key]) for key in keys]
+    for values in itertools.product(*ranges):
+        yield dict(zip(keys, values))
+
+def sampleParamList(paramDict, n, method='lhs', seed=None): #lazily yield n points sampled over the [start, stop] of each makeParameterStartStop*() spec
+    """Sample the design space of paramDict rather than enumerating it.
+    method='lhs' Latin hypercube, 'halton' or 'sobol' low-discrepancy sequences, or 'random' uniform
+    seed=None seeds the permutations and random draws for repeatable designs
+    logN specs are sampled uniformly in their exponent, as np.logspace spaces them; the others uniformly in value.
+    'sobol' needs scipy, without it 'halton' is used.
+    """
+    keys = list(paramDict)
+    d = len(keys)
+    lo = np.array([paramDict[k]['start'] for k in keys], dtype=float)
+    hi = np.array([paramDict[k]['stop'] for k in keys], dtype=float)
+    isLog = np.array([bool(paramDict[k].get('logN')) for k in keys])
+    rng = np.random.default_rng(seed)
+
+    if method == 'sobol':
+        try:
+            from scipy.stats import qmc
+            unit = _sobolPoints(qmc.Sobol(d, scramble=True, seed=seed), n)
+        except ImportError:
+            print('sampleParamList: scipy is not installed, using halton instead of sobol')
+            unit = _haltonPoints(d, n)
+    elif method == 'halton':
+        unit = _haltonPoints(d, n)
+    elif method == 'lhs':
+        unit = _latinHypercubePoints(d, n, rng)
+    elif method == 'random':
+        unit = (rng.random(d) for i in range(n))
+    else:
+        print('sampleParamList: unknown method [' + method + '], use lhs, halton, sobol or random')
+        return
+
+    for u in unit:
+        x = lo + u*(hi-lo)
+        x[isLog] = 10**x[isLog]
+        yield dict(zip(keys, x.tolist()))
+
+def _latinHypercubePoints(d, n, rng): #n points in [0,1)^d with one point in each of the n strata of every dimension
+    strata = np.array([rng.permutation(n) for j in range(d)]).T # n x d
+    for i in range(n):
+        yield (strata[i] + rng.random(d)) / n
+
+def _haltonPoints(d, n): #the first n points of the d-dimensional Halton sequence, skipping its initial 0
+    primes = []
+    p = 2
+    while len(primes) < d:
+        if all(p % q for q in primes):
+            primes.append(p)
+        p += 1
+    for i in range(1, n+1):
+        u = np.zeros(d)
+        for j,b in enumerate(primes): #radical inverse of i in base b
+            f = 1.0
+            k = i
+            while 0 < k:
+                f /= b
+                u[j] += f*(k % b)
+                k //= b
+        yield u
+
+def _sobolPoints(sobol, n, chunk=1024): #n points from a scipy Sobol engine, drawn in balanced power-of-2 chunks
+    while 0 < n:
+        block = sobol.random(chunk)
+        for u in block[:n]:
+            yield u
+        n -= chunk
+
 #from ModelicaSimulate import resimulate
 def resimulate( modelPath, resultPath ): #given paths to the Modelica model and result, returns True if the results are out of date and need to be resimulated
     """Compares the mtimes of modelPath and resultPath to determine if the model needs to be resimulated.
     modelPath -- path to the model file (*.mo)
     resultPath -- path to the result file (*.mat), usually provided by the return from ModelicaSimulate().
     If the result path not found or result mtime < model mtime, returns true to resimulate the model.
+    This ignores libraries, parameters and simulation options; ModelicaSimulate() itself returns the cached result of an identical simulation, so calling it unconditionally is cheap.
     """
     modelPath = os.path.expanduser( modelPath )
     resultPath = os.path.expanduser( resultPath )
@@ -0,0 +1,206 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Times the ModelicaResult hot paths on synthetic Dymola-format results, writing the timings as JSON.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/benchModelicaResult.py --variables 1000 100000 --times 1000 100000 --alias 0.8 --json bench.json
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaResult
+
+import os
+import gc
+import json
+import time
+import struct
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import numpy as np
+import matplotlib
+matplotlib.use('Agg') #headless, before ModelicaResult imports pyplot
+import matplotlib.pyplot as plt
+
+import ModelicaResult as MR
+from ModelicaResult import ModelicaResult
+
+def writeMatrixHeader(f, name, mopt, mrows, ncols): #MAT v4 header of a little endian matrix; mopt 0 for double, 20 for int32, 51 for text
+    f.write(struct.pack('<5i', mopt, mrows, ncols, 0, len(name)+1))
+    f.write(name.encode() + b'\0')
+
+def writeStrings(f, name, strings): #char matrix in binTrans layout, one string per column
+    width = max(len(s) for s in strings)
+    writeMatrixHeader(f, name, 51, width, len(strings))
+    for i in range(0, len(strings), 65536):
+        f.write(''.join(s.ljust(width) for s in strings[i:i+65536]).encode('latin-1'))
+
+def syntheticNames(nVariables, nFrames): #variable names shaped like an MSL multibody model: frames, then nested components
+    names = []
+    for k in range(nFrames):
+        names += ['body{}.frame_a.r_0[{}]'.format(k, j) for j in range(1,4)]
+    i = 0
+    while len(names) < nVariables:
+        names.append('comp{}.sub{}.{}'.format(i % 100, i, ('x', 'v', 'der(x)', 'height', 'width', 'density')[i % 6]))
+        i += 1
+    return names[:nVariables]
+
+def writeSyntheticResult(path, nVariables=1000, nTime=1000, aliasFraction=0.5, parameterFraction=0.1, nFrames=10, seed=0, chunkBytes=2**25): #write a binTrans Aclass 1.1 result, streaming data_2 so large files need little memory
+    """aliasFraction=0.5 share of the time-varying variables stored as (possibly negated) aliases of another variable's row, as OMC does for connected variables
+    parameterFraction=0.1 share of the variables stored in data_1 with only start and end values
+    nFrames=10 number of body frames, each three variables body<k>.frame_a.r_0[1..3], for plotAllFramesSpatial()
+    Returns the names written, excluding time.
+    """
+    rng = np.random.default_rng(seed)
+    nFrames = min(nFrames, nVariables // 3)
+    names = syntheticNames(nVariables, nFrames)
+    nParameters = min(int(nVariables*parameterFraction), nVariables - 3*nFrames)
+    nVarying = nVariables - nParameters
+    nStored = max(3*nFrames, nVarying - int(nVarying*aliasFraction), 1)
+
+    dataInfo = np.zeros((4, nVariables+1), dtype=np.int32)
+    dataInfo[:,0] = [0, 1, 0, -1] #time
+    dataInfo[0,1:nVarying+1] = 2
+    dataInfo[1,1:nStored+1] = np.arange(2, nStored+2) #data_2 row 1 is time
+    aliasOf = rng.integers(2, nStored+2, nVarying-nStored)
+    dataInfo[1,nStored+1:nVarying+1] = np.where(rng.random(nVarying-nStored) < 0.5, aliasOf, -aliasOf)
+    dataInfo[0,nVarying+1:] = 1
+    dataInfo[1,nVarying+1:] = np.arange(2, nParameters+2)
+    dataInfo[3,1:] = -1
+    t = np.linspace(0, 1, nTime)
+    frequency = 1 + np.arange(nStored) % 17
+    phase = rng.random(nStored)
+
+    with open(path, 'wb') as f:
+        writeMatrixHeader(f, 'Aclass', 51, 4, 11) #one string per row, unlike the binTrans names
+        f.write(np.array([[ord(c) for c in s.ljust(11)] for s in ['Atrajectory', '1.1', '', 'binTrans']], dtype=np.uint8).tobytes(order='F'))
+        writeStrings(f, 'name', ['time'] + names)
+        writeStrings(f, 'description', ['Time in [s]'] + ['synthetic variable'] * nVariables)
+        writeMatrixHeader(f, 'dataInfo', 20, 4, nVariables+1)
+        f.write(dataInfo.tobytes(order='F'))
+        writeMatrixHeader(f, 'data_1', 0, nParameters+1, 2)
+        f.write(np.vstack([t[[0,-1]], np.repeat(rng.random((nParameters,1)), 2, axis=1)]).astype('<f8').tobytes(order='F'))
+        writeMatrixHeader(f, 'data_2', 0, nStored+1, nTime)
+        step = max(1, chunkBytes // (8*(nStored+1)))
+        for i in range(0, nTime, step): #one time column after another
+            tc = t[i:i+step]
+            block = np.empty((len(tc), nStored+1))
+            block[:,0] = tc
+            block[:,1:] = np.sin(np.outer(tc, 2*np.pi*frequency) + phase)
+            f.write(block.astype('<f8').tobytes())
+    return names
+
+def timeIt(func, setup=None, repeat=3): #best and median seconds of func() over repeat runs, calling setup() untimed before each
+    seconds = []
+    for r in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        tstart = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - tstart)
+    return {'min':min(seconds), 'median':statistics.median(seconds), 'repeat':repeat}
+
+def benchmarkResult(path, names, repeat=3, nLookups=1000, plot=True): #time the ModelicaResult operations on the result at path
+    timings = {}
+    mre = ModelicaResult()
+
+    def load():
+        mre.loadResult(path, useSidecar=False)
+    timings['loadResult'] = timeIt(load, repeat=repeat)
+
+    MR.writeSidecar(path)
+    timings['loadResultSidecar'] = timeIt(lambda: mre.loadResult(path), repeat=repeat)
+    shutil.rmtree(MR.getSidecarPath(path), ignore_errors=True)
+    load()
+
+    probe = [names[i] for i in np.linspace(0, len(names)-1, min(nLookups, len(names))).astype(int)]
+    timings['findName'] = timeIt(lambda: [mre.findName(n) for n in probe], repeat=repeat)
+    timings['findName']['calls'] = len(probe)
+    timings['findNameMissing'] = timeIt(lambda: [mre.findName(n + '_missing') for n in probe], repeat=repeat)
+    timings['findNameMissing']['calls'] = len(probe)
+
+    def clearPartial():
+        mre._partialNames = {}
+    timings['findPartialName'] = timeIt(lambda: mre.findPartialName('sub1'), clearPartial, repeat)
+    timings['findPartialNameCached'] = timeIt(lambda: mre.findPartialName('sub1'), repeat=repeat)
+
+    def clearTree():
+        mre._componentTree = None
+        mre._partParents = None
+    timings['findNamesWithFields'] = timeIt(lambda: mre.findNamesWithFields(['height', 'width', 'density']), clearTree, repeat)
+
+    resultTime = mre.getTime()
+    t0s = np.linspace(resultTime[0], resultTime[-1], 1000)
+    varying = [n for n in probe if mre.dat.block(n) == 2]
+    timings['getData'] = timeIt(lambda: [mre.getData(n) for n in varying], repeat=repeat)
+    timings['getData']['calls'] = len(varying)
+    timings['getDataScalarT0'] = timeIt(lambda: [mre.getData(n, t0=float(resultTime[len(resultTime)//2])) for n in varying], repeat=repeat)
+    timings['getDataScalarT0']['calls'] = len(varying)
+    timings['getDataArrayT0'] = timeIt(lambda: [mre.getData(n, t0=t0s) for n in varying], repeat=repeat)
+    timings['getDataArrayT0']['calls'] = len(varying)
+    timings['getDataArrayT0']['times'] = len(t0s)
+
+    if mre.findName('body0.frame_a.r_0[1]'):
+        timings['getVector'] = timeIt(lambda: mre.getVector('body0.frame_a.r_0'), repeat=repeat)
+        timings['getVectorT0'] = timeIt(lambda: mre.getVector('body0.frame_a.r_0', t0=t0s), repeat=repeat)
+
+    if plot:
+        def plotFrames():
+            mre.plotAllFramesSpatial()
+            plt.close('all')
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w') #plotAllFramesSpatial prints the whole result
+        try:
+            timings['plotAllFramesSpatial'] = timeIt(plotFrames, repeat=repeat)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    mre.dat = [] #release the mapped file
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Time ModelicaResult on synthetic results, printing JSON. Every combination of --variables and --times is run.')
+    parser.add_argument('--variables', type=int, nargs='+', default=[1000, 10000], help='numbers of variables, eg 1000 500000')
+    parser.add_argument('--times', type=int, nargs='+', default=[1000], help='numbers of time points, eg 1000 1000000')
+    parser.add_argument('--alias', type=float, nargs='+', default=[0.5], help='shares of aliased variables, eg 0 0.9 for alias-heavy layouts')
+    parser.add_argument('--frames', type=int, default=10, help='number of body frames for plotAllFramesSpatial')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each operation, min and median are reported')
+    parser.add_argument('--noPlot', action='store_true', help='skip plotAllFramesSpatial')
+    parser.add_argument('--dir', default='', help='directory for the synthetic results, defaults to a temporary directory; large cases need the disk space')
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic results')
+    parser.add_argument('--json', default='', help='write the report here rather than to stdout')
+    args = parser.parse_args()
+
+    workDir = args.dir or tempfile.mkdtemp(prefix='benchModelicaResult_')
+    os.makedirs(workDir, exist_ok=True)
+    report = {'python':platform.python_version(), 'numpy':np.__version__, 'platform':platform.platform(), 'cases':[]}
+    try:
+        for nVariables in args.variables:
+            for nTime in args.times:
+                for aliasFraction in args.alias:
+                    path = os.path.join(workDir, 'synthetic_{}v_{}t_{}a.mat'.format(nVariables, nTime, aliasFraction))
+                    tstart = time.perf_counter()
+                    names = writeSyntheticResult(path, nVariables, nTime, aliasFraction, nFrames=args.frames)
+                    case = {'nVariables':nVariables, 'nTime':nTime, 'aliasFraction':aliasFraction, 'fileBytes':os.path.getsize(path), 'generateSeconds':time.perf_counter() - tstart}
+                    print('benchmarking', os.path.basename(path), file=sys.stderr)
+                    case['timings'] = benchmarkResult(path, names, args.repeat, plot=not args.noPlot)
+                    report['cases'].append(case)
+                    if not args.keep:
+                        os.remove(path)
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Stands in for a model executable built by OMC, so the ModelicaSimulate tests can run without OpenModelica.
+# The stub logs as the OpenModelica runtime does for -logFormat text and xml; with xmltcp it writes nothing to stdout and fails without a -port for OMEdit.
+# Its result holds 'time' and each overridden parameter as a constant trajectory, plus a parameter 'p' in data_1.
+
+import sys
+import os
+import stat
+import numpy as np
+
+_stats = [('timer', ['0.0001s [  1.0%] initialization', '0.0100s [100.0%] total']), ('solver: dassl', ['511 steps taken', '5 error test failures'])]
+
+def writeResultFile(path, values, nTime=11): #write a binTrans result of values {name:float}, each constant over time
+    names = ['time'] + list(values) + ['p']
+    dataInfo = np.array([[0, 1, 0, -1]] + [[2, i+2, 0, -1] for i in range(len(values))] + [[1, 2, 0, 0]], dtype='<i4').T
+    t = np.linspace(0, 1, nTime)
+    data2 = np.vstack([t] + [np.full(nTime, float(v)) for v in values.values()])
+    with open(path, 'wb') as f:
+        for name, matrix in (('Aclass', _chars(['Atrajectory', '1.1', '', 'binTrans'])), ('name', _chars(names).T), ('description', _chars(['']*len(names)).T),
+                             ('dataInfo', dataInfo), ('data_1', np.array([[0.0, 1.0], [2.5, 2.5]])), ('data_2', data2)):
+            mopt = {'u1':51, 'i4':20, 'f8':0}[matrix.dtype.str[1:]]
+            f.write(np.array([mopt, matrix.shape[0], matrix.shape[1], 0, len(name)+1], dtype='<i4').tobytes() + name.encode() + b'\0')
+            f.write(matrix.astype(matrix.dtype.newbyteorder('<')).tobytes(order='F'))
+
+def _chars(strings): #char matrix with one string per row
+    width = max(1, max(len(s) for s in strings))
+    return np.array([[ord(c) for c in s.ljust(width)] for s in strings], dtype=np.uint8)
+
+def _overrides(args): #the parameters given with -override or -overrideFile
+    lines = []
+    if '-override' in args:
+        lines = args['-override'].split(',')
+    if '-overrideFile' in args:
+        with open(args['-overrideFile']) as f:
+            lines = f.read().splitlines()
+    values = {}
+    for line in lines:
+        key, value = line.split('=', 1)
+        if key != 'variableFilter':
+            values[key] = float(value)
+    return values
+
+def main(argv): #run as the model executable
+    args = dict(a.split('=', 1) if '=' in a else (a, '') for a in argv)
+    logFormat = args.get('-logFormat', 'text')
+    if logFormat == 'xmltcp':
+        return 0 if '-port' in args else 1
+    logStats = 'LOG_STATS' in args.get('-lv', '')
+    if logFormat == 'xml':
+        print('<message stream="LOG_SUCCESS" type="info" text="The simulation finished successfully." />')
+        if logStats:
+            print('<message stream="LOG_STATS" type="info" text="### STATISTICS ###" >')
+            for section, lines in _stats:
+                print('<message stream="LOG_STATS" type="info" text="' + section + '" >')
+                for line in lines:
+                    print('<message stream="LOG_STATS" type="info" text="' + line + '" />')
+                print('</message>')
+            print('</message>')
+    else:
+        print('LOG_SUCCESS       | info    | The simulation finished successfully.')
+        if logStats:
+            print('LOG_STATS         | info    | ### STATISTICS ###')
+            for section, lines in _stats:
+                print('LOG_STATS         | info    | ' + section)
+                for line in lines:
+                    print('|                 | |       | | ' + line)
+    writeResultFile(args['-r'], _overrides(args))
+    return 0
+
+def makeStubModel(directory, modelName='stub', profile='diagnostic'): #write the stub executable, its _init.xml and a model file into directory, returning (modelPath, buildInfo) as buildModel() would
+    from ModelicaSimulate import profiles
+    exePath = os.path.join(directory, modelName)
+    with open(exePath, 'w') as f:
+        f.write('#!' + sys.executable + '\nimport sys\nsys.path.insert(0, ' + repr(os.path.dirname(os.path.abspath(__file__))) + ')\nimport stubExecutable\nsys.exit(stubExecutable.main(sys.argv[1:]))\n')
+    os.chmod(exePath, os.stat(exePath).st_mode | stat.S_IXUSR)
+    xmlPath = os.path.join(directory, modelName + '_init.xml')
+    with open(xmlPath, 'w') as f:
+        f.write('<fmiModelDescription/>')
+    modelPath = os.path.join(directory, modelName + '.mo')
+    with open(modelPath, 'w') as f:
+        f.write('model ' + modelName + '\n  parameter Real a = 1;\n  parameter Real b = 1;\n  annotation(experiment(StartTime=0, StopTime=1, Interval=0.1, Tolerance=1e-6));\nend ' + modelName + ';\n')
+    return modelPath, {'modelExecutablePath':exePath, 'modelXMLPath':xmlPath, 'modelName':modelName,
+                       'profile':profile, 'simflags':profiles[profile]['simflags'], 'success':True}
@@ -0,0 +1,64 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks loadEnsemble() on a directory of synthetic sweep results with differing time grids.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testEnsemble.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaResult
+sys.path.append('./test') #and benchModelicaResult
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import ModelicaResult as MR
+from ModelicaResult import MatResultFile
+from benchModelicaResult import writeSyntheticResult
+
+workDir = tempfile.mkdtemp(prefix='testEnsemble_')
+try:
+    runs = {'BB_res_a=1.000e+00.mat':(50, 0), 'BB_res_a=2.000e+00.mat':(80, 1), 'BB_res_a=3.000e+00.mat':(50, 2)} #name : (nTime, seed)
+    for name, (nTime, seed) in runs.items():
+        names = writeSyntheticResult(os.path.join(workDir, name), nVariables=60, nTime=nTime, aliasFraction=0.5, parameterFraction=0.1, nFrames=2, seed=seed)
+    with open(os.path.join(workDir, 'BB_res_a=4.000e+00.mat'), 'w') as f:
+        f.write('not a result')
+    with open(os.path.join(workDir, 'notes.txt'), 'w') as f:
+        f.write('skipped by fileRegex')
+    wanted = ['body0.frame_a.r_0[1]', names[10], names[-1], 'missing.variable']
+
+    for nWorkers, useProcesses in ((1, False), (3, False), (2, True)):
+        ensemble = MR.loadEnsemble(workDir, wanted, nWorkers=nWorkers, useProcesses=useProcesses)
+        files = sorted(os.path.join(workDir, n) for n in list(runs) + ['BB_res_a=4.000e+00.mat'])
+        assert ensemble['files'] == files and ensemble['names'] == wanted
+        assert ensemble['parameters'] == [{'a':1.0}, {'a':2.0}, {'a':3.0}, {'a':4.0}]
+        assert ensemble['failed'] == [files[3]] and np.isnan(ensemble['data'][3]).all()
+        grid = np.linspace(0, 1, 50) #the first run's grid
+        assert ensemble['data'].shape == (4, 4, 50) and np.allclose(ensemble['time'], grid)
+        for i, f in enumerate(files[:3]):
+            mat = MatResultFile(f)
+            time = mat.abscissa(2, True)
+            for j, n in enumerate(wanted[:3]):
+                expected = np.interp(grid, time, mat.data(n)) if mat.block(n) == 2 else np.interp(grid, mat.abscissa(1, True), mat.data(n))
+                assert np.allclose(ensemble['data'][i, j], expected), (f, n)
+            assert np.isnan(ensemble['data'][i, 3]).all() #a name missing from every run
+        print('loadEnsemble resamples every run onto the first grid with', nWorkers, 'processes' if useProcesses else 'threads')
+
+    t0 = np.linspace(0.1, 0.9, 9)
+    ensemble = MR.loadEnsemble([os.path.join(workDir, n) for n in runs], wanted[:1], t0=t0, nWorkers=1)
+    for i, name in enumerate(runs):
+        mat = MatResultFile(os.path.join(workDir, name))
+        assert np.allclose(ensemble['data'][i, 0], np.interp(t0, mat.abscissa(2, True), mat.data(wanted[0])))
+    assert np.array_equal(ensemble['time'], t0) and ensemble['failed'] == []
+    print('loadEnsemble resamples a list of results onto t0')
+
+    assert MR.loadEnsemble([], wanted)['data'].shape == (0, 4, 0)
+    print('loadEnsemble of no results is empty')
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
@@ -0,0 +1,58 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks which loadFile() calls reach OMC, using a stand-in that records them, so no OpenModelica is needed.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testLoadFile.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+
+import os
+import shutil
+import tempfile
+
+from ModelicaSimulate import ModelicaScriptingWrapper, getDefinedClasses
+
+class RecordingOMC: #answers cd() and loadFile() as OMC would, recording the files loaded
+    def __init__(self, workingDirectory):
+        self.workingDirectory = workingDirectory
+        self.loaded = []
+    def sendExpression(self, expression):
+        if expression.startswith('cd('):
+            return self.workingDirectory
+        if expression.startswith('loadFile('):
+            self.loaded.append(os.path.basename(expression[len('loadFile("'):-2]))
+            return True
+        raise ValueError('unexpected ' + expression)
+
+workDir = tempfile.mkdtemp(prefix='testLoadFile_')
+try:
+    files = {'A.mo':'// one pendulum\nmodel Pendulum\n  parameter Real L = 1;\nend Pendulum;\n',
+             'B.mo':'/* another model Pendulum */\nmodel Pendulum\n  parameter Real L = 2;\nend Pendulum;\n',
+             'Lib.mo':'within Parts;\npackage Springs\n  model Spring\n  end Spring;\nend Springs;\n'}
+    for name, text in files.items():
+        with open(os.path.join(workDir, name), 'w') as f:
+            f.write(text)
+    path = {name:os.path.join(workDir, name) for name in files}
+
+    assert getDefinedClasses(path['A.mo']) == {'Pendulum'}
+    assert getDefinedClasses(path['Lib.mo']) == {'Parts.Springs', 'Parts.Spring'}
+
+    msw = ModelicaScriptingWrapper(tempRoot=workDir)
+    msw._omc = RecordingOMC(workDir)
+    for name in ('Lib.mo', 'A.mo', 'A.mo', 'B.mo', 'Lib.mo', 'A.mo', 'A.mo'):
+        assert msw.loadFile(path[name])
+    assert msw._omc.loaded == ['Lib.mo', 'A.mo', 'B.mo', 'A.mo'], msw._omc.loaded
+    print('loadFile reloads a file whose classes another file redefined, and skips the rest')
+
+    with open(path['A.mo'], 'a') as f:
+        f.write('// changed\n')
+    assert msw.loadFile(path['A.mo']) and msw._omc.loaded[-1] == 'A.mo' and len(msw._omc.loaded) == 5
+    print('loadFile reloads a changed file')
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
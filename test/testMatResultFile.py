@@ -0,0 +1,106 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks MatResultFile and removeParameters() against DyMat on real and synthetic results.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testMatResultFile.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaResult
+sys.path.append('./test') #and benchModelicaResult
+
+import os
+import glob
+import shutil
+import tempfile
+import numpy as np
+import DyMat
+
+import ModelicaResult as MR
+from ModelicaResult import MatResultFile
+from benchModelicaResult import writeSyntheticResult
+
+def compareWithDyMat(path): #assert MatResultFile reads path exactly as DyMat does
+    mat = MatResultFile(path)
+    dym = DyMat.DyMatFile(path)
+    assert sorted(mat.names()) == sorted(dym.names()), path
+    for block in (1, 2):
+        assert sorted(mat.names(block)) == sorted(dym.names(block)), (path, block)
+        if not dym.names(block): #DyMat only transposes the binNormal blocks that hold variables
+            continue
+        assert mat.abscissa(block)[1:] == dym.abscissa(block)[1:], (path, block)
+        assert np.array_equal(mat.abscissa(block, True), dym.abscissa(block, True)), (path, block)
+    for n in dym.names():
+        assert mat.block(n) == dym.block(n), (path, n)
+        assert mat.description(n) == dym.description(n), (path, n)
+        assert np.array_equal(mat.data(n), dym.data(n)), (path, n)
+    print('MatResultFile matches DyMat on', path, '(', len(dym.names()), 'variables )')
+
+def writeNormalResult(path, names, descriptions, dataInfo, data1, data2): #write a binNormal result, one variable per column
+    with open(path, 'wb') as f:
+        MR._writeStrings(f, 'Aclass', ['Atrajectory', '1.1', '', 'binNormal'], False)
+        MR._writeStrings(f, 'name', names, False)
+        MR._writeStrings(f, 'description', descriptions, False)
+        for name, matrix in (('dataInfo', np.asarray(dataInfo, dtype='<i4')), ('data_1', np.asarray(data1, dtype='<f8')), ('data_2', np.asarray(data2, dtype='<f8'))):
+            MR._writeMatrixHeader(f, name, matrix.dtype, matrix.shape[0], matrix.shape[1])
+            f.write(matrix.tobytes(order='F'))
+
+def writeBigEndian(src, dst): #rewrite the little endian result src with every header and matrix big endian
+    mat = MatResultFile(src)
+    with open(dst, 'wb') as f:
+        for name, (dtype, mrows, ncols, offset) in mat._matrices.items():
+            text = name in ('Aclass', 'name', 'description')
+            matrix = np.asarray(mat._matrix(name), dtype=dtype.newbyteorder('>'))
+            MR._writeMatrixHeader(f, name, None if text else matrix.dtype, mrows, ncols, '>')
+            f.write(matrix.tobytes(order='F'))
+
+def checkRemoveParameters(path): #removeParameters() keeps what DyMat reads of the trajectories and drops the parameters
+    dym = DyMat.DyMatFile(path)
+    trajectories = {n:dym.data(n) for n in dym.names(2)}
+    nParameters = len(dym.names(1))
+    assert MR.removeParameters(path) == nParameters
+    compareWithDyMat(path)
+    dym = DyMat.DyMatFile(path)
+    assert dym.names(1) == [] and sorted(dym.names(2)) == sorted(trajectories), path
+    assert all(np.array_equal(dym.data(n), trajectories[n]) for n in trajectories), path
+    assert MR.removeParameters(path) == 0
+    print('removeParameters dropped', nParameters, 'parameters from', path)
+
+workDir = tempfile.mkdtemp(prefix='testMatResultFile_')
+try:
+    results = glob.glob('./test/dampedPendulum/*.mat')
+    if not results:
+        print('no ./test/dampedPendulum/*.mat, run test/testModelicaSimulate.py to create one')
+    for path in results:
+        compareWithDyMat(path)
+
+    for aliasFraction in (0, 0.5, 0.9): #alias-heavy layouts share rows, some negated
+        path = os.path.join(workDir, 'synthetic_{}.mat'.format(aliasFraction))
+        writeSyntheticResult(path, nVariables=300, nTime=50, aliasFraction=aliasFraction, parameterFraction=0.2, nFrames=5)
+        compareWithDyMat(path)
+
+    t = np.linspace(0, 1, 11)
+    path = os.path.join(workDir, 'normal.mat')
+    writeNormalResult(path, ['time', 'x', 'v', 'negX', 'm'], ['Time in [s]', 'position', 'velocity', 'alias of -x', 'mass'],
+                      [[0, 1, 0, -1], [2, 2, 0, -1], [2, 3, 0, -1], [2, -2, 0, -1], [1, 2, 0, 0]], #one row per variable in binNormal
+                      [[0, 2.5], [1, 2.5]], np.column_stack([t, np.sin(t), np.cos(t)])) #and one row per time
+    compareWithDyMat(path)
+    mat = MatResultFile(path)
+    assert np.array_equal(mat.abscissa(2, True), t) and np.array_equal(mat.data('negX'), -np.sin(t)) and np.array_equal(mat.data('m'), [2.5, 2.5])
+    assert mat.abscissa('x')[2] == 'Time in [s]'
+    del mat #release the mapped file before removing it
+
+    for name in ('synthetic_0.5', 'normal'): #both layouts, either byte order
+        path = os.path.join(workDir, name + '.mat')
+        bigPath = os.path.join(workDir, name + '_big.mat')
+        writeBigEndian(path, bigPath)
+        compareWithDyMat(bigPath)
+        checkRemoveParameters(bigPath)
+        assert MatResultFile(bigPath)._matrices['data_2'][0].str[0] == '>'
+        checkRemoveParameters(path)
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
@@ -0,0 +1,56 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks the lazy sweep generators against the list-based expansion they replaced.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testParamList.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+
+import itertools
+import numpy as np
+
+import ModelicaSimulate as MS
+from ModelicaSimulate import ModelicaScriptingWrapper
+
+msw = ModelicaScriptingWrapper()
+
+def listExpansion(paramDict): #the original elaborateParamList(), growing a list one parameter at a time
+    lst = []
+    for key in paramDict:
+        pl = paramDict[key]
+        if pl.get('increment'):
+            rng = np.arange(pl['start'], pl['stop'], pl['increment'] )
+        if pl.get('n'):
+            rng = np.array([pl['start']]) if pl['n'] == 1 else np.linspace(pl['start'], pl['stop'], pl['n'] )
+        if pl.get('logN'):
+            rng = np.array([pl['start']]) if pl['logN'] == 1 else np.logspace(pl['start'], pl['stop'], pl['logN'] )
+        lst = msw.elaborateRangesDict(lst, key=key, rng=rng)
+    return lst
+
+specs = [{},
+         MS.makeParameterStartStopN('a', 0, 1, 5),
+         dict(MS.makeParameterStartStopN('a', 0, 1, 3), **MS.makeParameterStartStopInc('b', 1e-5, 1e-4, 1e-5)),
+         dict(MS.makeParameterStartStopLogN('c', -2, 1, 4), **MS.makeParameterStartStopN('a', 2, 2, 1), **MS.makeParameterStartStopLogN('d', 0, 0, 1), **MS.makeParameterStartStopN('e', -1, 1, 7))]
+for spec in specs:
+    expected = listExpansion(spec)
+    points = list(MS.iterateParamList(spec))
+    assert points == expected, (spec, points[:3], expected[:3])
+    assert msw.elaborateParamList(spec) == expected
+    assert MS.countSweepPoints(spec) == len(expected), (spec, MS.countSweepPoints(spec), len(expected))
+    assert list(MS._sweepPoints(spec)) == expected
+    print('iterateParamList gives the', len(expected), 'points of', list(spec), 'in order')
+
+assert MS.countSweepPoints([{'a':1}, {'a':2}]) == 2
+assert MS.countSweepPoints(MS.sampleParamList(specs[1], 10)) is None
+assert len(list(MS.sampleParamList(specs[2], 10, seed=0))) == 10
+print('countSweepPoints counts lists and leaves generators unknown')
+
+generator = MS.iterateParamList(dict(('p{}'.format(i), MS.makeParameterStartStopN('p{}'.format(i), 0, 1, 10)['p{}'.format(i)]) for i in range(9)))
+assert len(list(itertools.islice(generator, 5))) == 5 #1e9 points, only the first are made
+print('iterateParamList yields the first points of a huge sweep without expanding it')
@@ -0,0 +1,58 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks that the profiles' simflags give runExecutable() and simulate() output they accept, using test/stubExecutable.py in place of a built model's executable.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testRunExecutable.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+sys.path.append('./test') #and stubExecutable
+
+import os
+import shutil
+import tempfile
+
+from ModelicaSimulate import ModelicaScriptingWrapper, profiles
+from stubExecutable import makeStubModel
+
+workDir = tempfile.mkdtemp(prefix='testRunExecutable_')
+try:
+    modelPath, stubBuildInfo = makeStubModel(workDir)
+
+    msw = ModelicaScriptingWrapper(tempRoot=workDir)
+    for profile in profiles:
+        buildInfo = dict(stubBuildInfo, profile=profile, simflags=profiles[profile]['simflags'])
+        simInfo = msw.runExecutable(buildInfo, {'a':0.5})
+        assert simInfo['success'], (profile, simInfo['command'], simInfo['messages'])
+        assert simInfo['solverStatistics'] is not None and simInfo['solverStatistics'].steps == 511, (profile, simInfo['messages'])
+        print('runExecutable accepts the output of the', profile, 'simflags')
+
+    simInfo = msw.runExecutable(dict(buildInfo, simflags='-lv=LOG_STATS -logFormat=xmltcp'))
+    assert not simInfo['success']
+    print('runExecutable rejects a run logging to the xmltcp socket')
+
+    from ModelicaResult import MatResultFile
+    params = {'a':0.123456789, 'b':2}
+    for precise in (False, True): #-override, the -overrideFile a variableFilter needs and one for long override lists give the same values
+        values = []
+        for variableFilter, extra in (('', {}), ('a|b', {}), ('', {'c{}'.format(i):float(i) for i in range(300)})):
+            simInfo = msw.runExecutable(stubBuildInfo, dict(params, **extra), variableFilter=variableFilter, precise=precise)
+            assert simInfo['success'] and ('-overrideFile=' in simInfo['command']) == bool(variableFilter or extra), simInfo['command']
+            values.append(MatResultFile(simInfo['resultFile']).data('a')[0])
+        assert values == [0.123456789 if precise else 0.1235]*3, (precise, values)
+    print('runExecutable passes parameters at the same precision by -override and -overrideFile')
+
+    sent = []
+    msw.executeCommand = lambda simOptions: sent.append(dict(simOptions)) #capture the simulate() command instead of calling OMC
+    msw.simulate('stub', {'simflags':'"-override=a=0.5"'}, 'diagnostic')
+    msw.simulate('stub', {}, 'diagnostic')
+    assert sent[0]['simflags'] == '"' + profiles['diagnostic']['simflags'] + ' -override=a=0.5"', sent[0]['simflags']
+    assert sent[1]['simflags'] == '"' + profiles['diagnostic']['simflags'] + '"', sent[1]['simflags']
+    print('simulate() keeps the profile simflags alongside the caller\'s')
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
@@ -0,0 +1,87 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks the columnar sidecar: that it reads as its source result does, and that a changed result makes it stale.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testSidecar.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaResult
+sys.path.append('./test') #and benchModelicaResult
+
+import os
+import glob
+import shutil
+import tempfile
+import numpy as np
+
+import ModelicaResult as MR
+from ModelicaResult import ModelicaResult, MatResultFile, SidecarResultFile
+from benchModelicaResult import writeSyntheticResult
+
+def compareSidecar(path): #assert the fresh sidecar of path reads as path itself
+    mat = MatResultFile(path)
+    side = SidecarResultFile(MR.getSidecarPath(path))
+    assert sorted(side.names()) == sorted(mat.names())
+    for block in (1, 2):
+        assert sorted(side.names(block)) == sorted(mat.names(block))
+        assert side.size(block) == mat.size(block)
+        assert np.array_equal(side.abscissa(block, True), mat.abscissa(block, True))
+        assert side.abscissa(block)[1:] == mat.abscissa(block)[1:]
+    for n in mat.names():
+        assert side.block(n) == mat.block(n), n
+        assert side.description(n) == mat.description(n), n
+        assert np.array_equal(side.data(n), mat.data(n)), n
+        assert sorted(side.sharedData(n)) == sorted(mat.sharedData(n)), n
+
+workDir = tempfile.mkdtemp(prefix='testSidecar_')
+try:
+    path = os.path.join(workDir, 'synthetic.mat')
+    for compress in (False, True):
+        writeSyntheticResult(path, nVariables=200, nTime=40, aliasFraction=0.5, parameterFraction=0.2, nFrames=3)
+        assert not MR.isSidecarFresh(path)
+        assert MR.writeSidecar(path, compress=compress) == MR.getSidecarPath(path)
+        assert MR.isSidecarFresh(path)
+        compareSidecar(path)
+        print('the sidecar reads as its result with compress', compress)
+
+    mre = ModelicaResult()
+    assert mre.loadResult(path) and isinstance(mre.dat, SidecarResultFile)
+    before = mre.getData('body0.frame_a.r_0[1]')
+    mre.dat = [] #release the mapped files
+
+    writeSyntheticResult(path, nVariables=200, nTime=60, aliasFraction=0.5, parameterFraction=0.2, nFrames=3, seed=1) #a resimulated result
+    assert not MR.isSidecarFresh(path)
+    assert mre.loadResult(path) and isinstance(mre.dat, MatResultFile) #the stale sidecar is not read
+    assert len(mre.getData('body0.frame_a.r_0[1]')) == 60 != len(before)
+    assert mre.loadResult(path, makeSidecar=True) and isinstance(mre.dat, SidecarResultFile) and MR.isSidecarFresh(path)
+    assert len(mre.getData('body0.frame_a.r_0[1]')) == 60
+    assert mre.loadResult(path, useSidecar=False) and isinstance(mre.dat, MatResultFile)
+    mre.dat = []
+    print('a resimulated result makes its sidecar stale, and makeSidecar rewrites it')
+
+    with open(os.path.join(MR.getSidecarPath(path), 'index.json'), 'w') as f:
+        f.write('{"version":') #cut short
+    assert not MR.isSidecarFresh(path)
+    print('a damaged sidecar is stale')
+
+    writeSidecarFiles = MR._writeSidecarFiles
+    def failing(*args):
+        writeSidecarFiles(*args)
+        raise OSError('disk full')
+    MR._writeSidecarFiles = failing
+    try:
+        MR.writeSidecar(path)
+        assert False, 'writeSidecar should raise'
+    except OSError:
+        pass
+    finally:
+        MR._writeSidecarFiles = writeSidecarFiles
+    assert glob.glob(os.path.join(workDir, '.cols_*')) == []
+    print('a failed writeSidecar leaves no staging directory')
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
@@ -0,0 +1,50 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Runs concurrent ModelicaSimulateAsync() calls on test/stubExecutable.py in place of a model built by OMC.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testSimulateAsync.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+sys.path.append('./test') #and stubExecutable
+
+import os
+import shutil
+import asyncio
+import tempfile
+
+import ModelicaSimulate as MS
+from ModelicaSimulate import ModelicaScriptingWrapper
+from ModelicaResult import MatResultFile, parseOverrideString
+from stubExecutable import makeStubModel
+
+workDir = tempfile.mkdtemp(prefix='testSimulateAsync_')
+try:
+    modelPath, buildInfo = makeStubModel(workDir, 'BouncingBall')
+    MS._buildModel = lambda msw, fullPath, modelName, libraryPaths, simOps, profile='diagnostic': buildInfo #no OMC here
+    msw = ModelicaScriptingWrapper(tempRoot=workDir)
+    msw.cacheDir = ''
+    resultPath = os.path.join(workDir, 'results')
+    os.makedirs(resultPath)
+
+    # calls with the same parameters, or parameters whose 4 digit overrideStrings are the same, keep their own results
+    parameters = [{}, {}, {}, {'a':0.30001}, {'a':0.30002}, {'a':0.30002}]
+    async def simulateAll():
+        return await asyncio.gather(*(MS.ModelicaSimulateAsync(modelPath, 'BouncingBall', [], p, resultPath, session=msw) for p in parameters))
+    simInfos = asyncio.run(simulateAll())
+    assert all(s['success'] for s in simInfos), simInfos
+    assert len(set(s['resultFile'] for s in simInfos)) == len(parameters)
+    assert len(set(s['logFile'] for s in simInfos)) == len(parameters)
+    assert len(os.listdir(resultPath)) == 2*len(parameters)
+    for p, s in zip(parameters, simInfos):
+        if p:
+            assert MatResultFile(s['resultFile']).data('a')[0] == p['a'], (p, s['command'])
+        assert parseOverrideString(s['resultFile']) == p, s['resultFile'] #the call id suffix is not part of the parameters
+    print('ModelicaSimulateAsync keeps concurrent results apart and passes parameters at full precision')
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)
@@ -0,0 +1,79 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Checks parseSolverStatistics() on LOG_STATS blocks captured from OpenModelica executables.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testSolverStatistics.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+
+from ModelicaSimulate import parseSolverStatistics
+
+# LOG_STATS as printed by an OpenModelica executable with the default -logFormat=text
+textLog = '''LOG_SUCCESS       | info    | The initialization finished successfully without homotopy method.
+LOG_SUCCESS       | info    | The simulation finished successfully.
+LOG_STATS         | info    | ### STATISTICS ###
+LOG_STATS         | info    | timer
+|                 | |       | |  0.000412s [  4.1%] pre-initialization
+|                 | |       | |  0.000102s [  1.0%] initialization
+|                 | |       | | 2.0e-05s [  0.2%] steps
+|                 | |       | |  0.000811s [  8.1%] solver (excl. callbacks)
+|                 | |       | |  0.000133s [  1.3%] creating output-file
+|                 | |       | |   4.2e-05s [  0.4%] event-handling
+|                 | |       | |  0.003912s [ 39.1%] overhead
+|                 | |       | |  0.010004s [100.0%] total
+LOG_STATS         | info    | events
+|                 | |       | |     2 state events
+|                 | |       | |     0 time events
+LOG_STATS         | info    | solver: dassl
+|                 | |       | |   511 steps taken
+|                 | |       | |   743 calls of functionODE
+|                 | |       | |    98 evaluations of jacobian
+|                 | |       | |     5 error test failures
+|                 | |       | |     1 convergence test failures
+|                 | |       | | 0.000321s time of jacobian evaluation
+'''
+stats = parseSolverStatistics(textLog)
+assert stats is not None
+assert stats.solver == 'dassl'
+assert stats.initializationTime == 0.000102 and stats.totalTime == 0.010004 and stats.solverTime == 0.000811
+assert stats.jacobianTime == 0.000321 and stats.eventHandlingTime == 4.2e-05
+assert stats.steps == 511 and stats.functionEvaluations == 743 and stats.jacobianEvaluations == 98
+assert stats.errorTestFailures == 5 and stats.convergenceTestFailures == 1 and stats.rejectedSteps == 6
+assert stats.stateEvents == 2 and stats.timeEvents == 0
+assert stats.counts['events/state events'] == 2 and stats.timers['overhead'] == 0.003912
+print('parseSolverStatistics reads the text LOG_STATS block')
+
+# the same block with -logFormat=xmltcp, nested messages and escaped text
+xmlLog = '''<message stream="LOG_SUCCESS" type="info" text="The simulation finished successfully." />
+<message stream="LOG_STATS" type="info" text="### STATISTICS ###" >
+  <message stream="LOG_STATS" type="info" text="timer" >
+    <message stream="LOG_STATS" type="info" text="  0.000102s [  1.0%] initialization" />
+    <message stream="LOG_STATS" type="info" text="  0.000811s [  8.1%] solver (excl. callbacks)" />
+    <message stream="LOG_STATS" type="info" text="  0.010004s [100.0%] total" />
+  </message>
+  <message stream="LOG_STATS" type="info" text="events" >
+    <message stream="LOG_STATS" type="info" text="    2 state events" />
+    <message stream="LOG_STATS" type="info" text="    0 time events" />
+  </message>
+  <message stream="LOG_STATS" type="info" text="solver: dassl &amp; friends" >
+    <message stream="LOG_STATS" type="info" text="  511 steps taken" />
+    <message stream="LOG_STATS" type="info" text="    5 error test failures" />
+  </message>
+</message>
+'''
+stats = parseSolverStatistics(xmlLog)
+assert stats is not None
+assert stats.solver == 'dassl & friends'
+assert stats.initializationTime == 0.000102 and stats.solverTime == 0.000811 and stats.totalTime == 0.010004
+assert stats.steps == 511 and stats.stateEvents == 2 and stats.timeEvents == 0
+assert stats.errorTestFailures == 5 and stats.convergenceTestFailures is None and stats.rejectedSteps == 5
+print('parseSolverStatistics reads the xml LOG_STATS block')
+
+assert parseSolverStatistics('LOG_SUCCESS | info | The simulation finished successfully.') is None
+print('parseSolverStatistics returns None without a LOG_STATS block')
@@ -0,0 +1,75 @@
+# MIT License
+# Copyright (c) 2023 Mechanomy LLC
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Runs the sweeps, and resumes them from their manifests, on test/stubExecutable.py in place of a model built by OMC.
+# nb: paths are relative to the terminal, not to this file, eg
+#   python test/testSweep.py
+
+import sys
+sys.path.append('.') #import parent to locate ModelicaSimulate
+sys.path.append('./test') #and stubExecutable
+
+import os
+import shutil
+import tempfile
+
+import ModelicaSimulate as MS
+from ModelicaSimulate import ModelicaScriptingWrapper
+from ModelicaResult import parseOverrideString
+from stubExecutable import makeStubModel
+
+def aMetric(mre): #score a result by its parameter a, lower is better
+    return float(mre.getData('a')[-1])
+
+workDir = tempfile.mkdtemp(prefix='testSweep_')
+try:
+    modelPath, buildInfo = makeStubModel(workDir, 'BouncingBall')
+    MS._buildModel = lambda msw, fullPath, modelName, libraryPaths, simOps, profile='diagnostic': buildInfo #no OMC here
+    msw = ModelicaScriptingWrapper(tempRoot=workDir)
+    msw.cacheDir = ''
+    msw.omcVersion = 'stub' #the manifest's sweepKey would otherwise ask OMC
+
+    # points whose 4 digit overrideStrings are the same must keep separate results
+    for nProcesses in (1, 2):
+        resultDir = os.path.join(workDir, 'analyze{}'.format(nProcesses))
+        os.makedirs(resultDir)
+        points = [{'a':0.30001, 'b':0.7}, {'a':0.30002, 'b':0.7}, {'a':0.30003, 'b':0.7}]
+        sweepInfo = MS.ModelicaSimulateAnalyzeSweep(modelPath, 'BouncingBall', [], points, nKeep=2, resultDir=resultDir, session=msw, metric=aMetric, nProcesses=nProcesses)
+        assert [s['paramList'] for s in sweepInfo] == points[:2], sweepInfo
+        assert len(set(s['resultFile'] for s in sweepInfo)) == 2 and all(os.path.exists(s['resultFile']) for s in sweepInfo)
+        assert sorted(os.listdir(resultDir)) == sorted(os.path.basename(s['resultFile']) for s in sweepInfo)
+        assert all(parseOverrideString(s['resultFile']) == {'a':0.3, 'b':0.7} for s in sweepInfo) #the index suffix is not part of b
+        print('ModelicaSimulateAnalyzeSweep keeps alike-named points apart with nProcesses', nProcesses)
+    # a rerun sweep resumes from its manifest the points whose results remain, under the same model and settings
+    resultDir = os.path.join(workDir, 'sweep')
+    os.makedirs(resultDir)
+    spec = MS.makeParameterStartStopN('a', 0, 1, 4)
+    def sweep(**kwargs):
+        sweepInfo = MS.ModelicaSimulateSweep(modelPath, 'BouncingBall', [], spec, resultDir, session=msw, **kwargs)
+        assert [s['paramList'] for s in sweepInfo] == list(MS.iterateParamList(spec)) and all(s['success'] for s in sweepInfo)
+        return [bool(s.get('resumed')) for s in sweepInfo]
+    manifestPath = os.path.join(resultDir, 'BouncingBall_sweep.jsonl')
+    assert sweep() == [False]*4 and os.path.exists(manifestPath)
+    assert sweep() == [True]*4
+    os.remove(os.path.join(resultDir, 'BouncingBall_res_a=3.333e-01.mat'))
+    assert sweep() == [True, False, True, True]
+    print('ModelicaSimulateSweep resumes the points whose results remain')
+
+    with open(manifestPath, 'a') as f:
+        f.write('{"paramList": {"a": 0.0}, "sta') #a sweep killed mid-write
+    assert sweep() == [True]*4
+    print('ModelicaSimulateSweep resumes past a manifest line cut short')
+
+    assert sweep(resume=False) == [False]*4
+    assert sweep(outputs=['a']) == [False]*4 #other settings, another sweepKey
+    assert sweep(outputs=['a']) == [True]*4
+    assert sweep(profile='throughput') == [False]*4
+    assert sweep(manifestPath=None) == [False]*4
+    print('ModelicaSimulateSweep only resumes points run with the same settings')
+
+finally:
+    shutil.rmtree(workDir, ignore_errors=True)